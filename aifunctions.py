@@ -5,14 +5,11 @@ import base64
 import os
 import cv2
 import copy
-import numpy as np
 import os.path
-import shutil
-import speech_recognition as sr 
-from pydub import AudioSegment
-from pydub.silence import split_on_silence
 from gtts import gTTS
 from websocket import create_connection
+import workspace
+import colorizer
 
 
 ############################################################################################################
@@ -31,9 +28,10 @@ def bg_remove(file):
 	response = requests.post(url, data=payload).json()
 	data = response["data"][0].split(",")[1]
 	image = base64.b64decode(data)
-	with open(name + "_bg_removed." + ext, "wb") as f: f.write(image)
+	output = workspace.output(name + "_bg_removed." + ext)
+	with open(output, "wb") as f: f.write(image)
 
-	return name + "_bg_removed." + ext
+	return output
 
 
 ############################################################################################################
@@ -59,7 +57,7 @@ def riffusion(prompt):
 	result =  json.loads(ws.recv())
 	ws.close()
 
-	name = "".join( x for x in prompt if (x.isalnum() or x in " "))
+	name = workspace.path("".join( x for x in prompt if (x.isalnum() or x in " ")))
 	image = base64.b64decode(result["output"]["data"][0].split(",")[1])
 	with open(name + ".jpeg","wb") as f: f.write(image)
 	music = requests.get("https://fffiloni-spectrogram-to-music.hf.space/file=" + result["output"]["data"][1]["name"])
@@ -190,9 +188,9 @@ def stabilityAI(prompt):
 	final = []
 	for i, img in enumerate(imgs):
 		image = base64.b64decode(img.split(",")[1])
-		with open(f"{i+1}-{prompt}.jpeg","wb") as file:
+		with open(workspace.path(f"{i+1}-{prompt}.jpeg"),"wb") as file:
 			file.write(image)
-		final.append(f"{i+1}-{prompt}.jpeg")
+		final.append(workspace.path(f"{i+1}-{prompt}.jpeg"))
 	return final
 
 
@@ -216,8 +214,8 @@ def pointE(prompt):
 
 	plot_data = json.loads(response["data"][0]["plot"])
 	fig = go.Figure(data=plot_data["data"])
-	pio.write_html(fig, f'{prompt}.html')
-	return f'{prompt}.html'
+	pio.write_html(fig, workspace.path(f'{prompt}.html'))
+	return workspace.path(f'{prompt}.html')
 
 
 ############################################################################################################
@@ -352,10 +350,10 @@ def mindallestatus(hash,prompt="min-dalle"):
 	
 	data = response["data"]["data"][0].split(",")[1]
 	image = base64.b64decode(data)
-	with open(f"{prompt}.jpeg","wb") as file:
+	with open(workspace.path(f"{prompt}.jpeg"),"wb") as file:
 		file.write(image)
 
-	return f"{prompt}.jpeg"
+	return workspace.path(f"{prompt}.jpeg")
 
 
 def dallemini(prompt):
@@ -379,15 +377,16 @@ def dallemini(prompt):
 
 	payload = json.dumps({"prompt": prompt})
 	response = requests.request("POST", reqUrl, data=payload, headers=headersList).json()
-	os.mkdir(prompt)
+	folder = workspace.path(prompt)
+	os.mkdir(folder)
 
 	images = []
 	i = 1
 	for ele in response["images"]:
 		image = base64.b64decode(ele.replace('\\n',''))
-		with open(f"{prompt}/{i}.jpeg","wb") as file:
+		with open(f"{folder}/{i}.jpeg","wb") as file:
 			file.write(image)
-		images.append(f"{prompt}/{i}.jpeg")
+		images.append(f"{folder}/{i}.jpeg")
 		i = i + 1
 		
 	return images
@@ -481,10 +480,10 @@ def stablediffstatus(hash,prompt="stable-diff"):
 		return None
 	data = data.split(",")[1]
 	image = base64.b64decode(data)
-	with open(f"{prompt}.png","wb") as file:
+	with open(workspace.path(f"{prompt}.png"),"wb") as file:
 		file.write(image)
 	
-	return f"{prompt}.png"
+	return workspace.path(f"{prompt}.png")
 
 
 ##############################################################################################################
@@ -582,44 +581,11 @@ def positiver(filepath, output):
 # image colorizer
 
 
-version = '7 June 2020'
-prototxt = r'model/colorization_deploy_v2.prototxt'
-model = r'model/colorization_release_v2.caffemodel'
-points = r'model/pts_in_hull.npy'
-points = os.path.join(os.path.dirname(__file__), points)
-prototxt = os.path.join(os.path.dirname(__file__), prototxt)
-model = os.path.join(os.path.dirname(__file__), model)
-net = cv2.dnn.readNetFromCaffe(prototxt, model)     # load model from disk
-pts = np.load(points)
-
-# add the cluster centers as 1x1 convolutions to the model
-class8 = net.getLayerId("class8_ab")
-conv8 = net.getLayerId("conv8_313_rh")
-pts = pts.transpose().reshape(2, 313, 1, 1)
-net.getLayer(class8).blobs = [pts.astype("float32")]
-net.getLayer(conv8).blobs = [np.full([1, 313], 2.606, dtype="float32")]
-
+# the caffe model is loaded by colorizer on first use, not at import
 def colorize_image(output, image_filename=None, cv2_frame=None):
    
 	image = cv2.imread(image_filename) if image_filename else cv2_frame
-	scaled = image.astype("float32") / 255.0
-	lab = cv2.cvtColor(scaled, cv2.COLOR_BGR2LAB)
-
-	resized = cv2.resize(lab, (224, 224))
-	L = cv2.split(resized)[0]
-	L -= 50
-
-	net.setInput(cv2.dnn.blobFromImage(L))
-	ab = net.forward()[0, :, :, :].transpose((1, 2, 0))
-	ab = cv2.resize(ab, (image.shape[1], image.shape[0]))
-
-	L = cv2.split(lab)[0]
-	colorized = np.concatenate((L[:, :, np.newaxis], ab), axis=2)
-	colorized = cv2.cvtColor(colorized, cv2.COLOR_LAB2BGR)
-	colorized = np.clip(colorized, 0, 1)
-	colorized = (255 * colorized).astype("uint8")
-	
-	cv2.imwrite(output, colorized)
+	cv2.imwrite(output, colorizer.colorize(image))
 
 
 ##############################################################################################################
@@ -640,10 +606,10 @@ def latentdiff(prompt):
 
 	data = response["data"][0].split(",")[1]
 	image = base64.b64decode(data)
-	with open(f"{prompt}.jpg","wb") as file:
+	with open(workspace.path(f"{prompt}.jpg"),"wb") as file:
 		file.write(image)
 
-	return f"{prompt}.jpg"
+	return workspace.path(f"{prompt}.jpg")
 
 
 def latdif(prompt, AutoCall=True):
@@ -736,75 +702,15 @@ def latdifstatus(hash, prompt="latentdiffusion"):
 		data = response["data"]["data"][1][i][0].split(",")[1]
 		image = base64.b64decode(data)
 
-		with open(f"{i+1}-{prompt}.png","wb") as file:
+		with open(workspace.path(f"{i+1}-{prompt}.png"),"wb") as file:
 			file.write(image)
 
-		imagelist.append(f"{i+1}-{prompt}.png")
+		imagelist.append(workspace.path(f"{i+1}-{prompt}.png"))
 
 	return imagelist
 
 
-##############################################################################################################
-# speech to text
-
-
-r = sr.Recognizer()
-
-def get_large_audio_transcription(path,message):
-
-	id = message.id
-	sound = AudioSegment.from_wav(path)  
-	chunks = split_on_silence(sound,
-		min_silence_len = 500,
-		silence_thresh = sound.dBFS-14,
-		keep_silence=500,
-	)
-
-	folder_name = f"audio-chunks-{id}"
-	if not os.path.isdir(folder_name):
-		os.mkdir(folder_name)
-	whole_text = ""
-
-	tsize = os.path. getsize(path)
-	# edi = app.send_message(message.chat.id,f"Total Size: {tsize}") # status
-	psize = 0
-
-	for i, audio_chunk in enumerate(chunks, start=1):
-		chunk_filename = os.path.join(folder_name, f"chunk{i}.wav")
-		audio_chunk.export(chunk_filename, format="wav")
-
-		with sr.AudioFile(chunk_filename) as source:
-			audio_listened = r.record(source)
-
-			try:
-				text = r.recognize_google(audio_listened)
-			except sr.UnknownValueError as e:
-				#print("Error:", str(e))
-				whole_text += "\n(error)\n"
-			else:
-				text = f"{text.capitalize()}. "
-				#print(chunk_filename, ":", text)
-				whole_text += text
-		size = os.path. getsize(chunk_filename)        
-		psize = psize + size
-		# app.edit_message_text(f"Processed {psize/1024/1024} MB out of {tsize/1024/1024} MB - {math.floor(psize*100/tsize)}%",message.chat.id,edi.message_id)
-
-	return whole_text
-
-
-def splitfn(file,message,output):
-	
-	converted = get_large_audio_transcription(file,message)
-	
-	with open(output,"w") as file:
-		file.write(converted)
-	
-	shutil.rmtree(f"audio-chunks-{message.id}", ignore_errors=True)
-	return output
-
-
-
-#######################################################################################################################################################
+########################################################################################################################
 # text to speech
 
 
@@ -951,10 +857,10 @@ def cogvideostatus(hash,prompt="cogvideo"):
 
 	data = response["data"]["data"][1]["data"].split(",")[1]
 	video = base64.b64decode(data)
-	with open(f"{prompt}.mp4","wb") as file:
+	with open(workspace.path(f"{prompt}.mp4"),"wb") as file:
 		file.write(video)
 
-	return f"{prompt}.mp4"
+	return workspace.path(f"{prompt}.mp4")
 
 
 ########################################################################################################################################################	
@@ -9,6 +9,7 @@ VIDAUD = (
     "AIFF", "AAC", "M4A", "OGA", "WMA", "FLAC", "WAV", "OPUS", "OGG",
     "MP3", "MKV", "MP4", "MOV", "AVI", "M4B", "VOB", "DVD", "WEBM", "WMV",
 )
+VID = ("MKV", "MP4", "MOV", "AVI", "VOB", "DVD", "WEBM", "WMV")
 
 IMG = ("SVG", "OCR", "ICO", "GIF", "TIFF", "BMP", "WEBP", "JP2", "JPEG", "JPG", "PNG")
 
@@ -30,6 +31,18 @@ T3D = ("CTM", "PLY", "STL", "3DS", "DAE", "OBJ", "LWO", "OFF", "WRL")
 VAboard = ReplyKeyboard(row_width=3, one_time_keyboard=True,
                         placeholder="convert to", resize_keyboard=True, selective=True)
 VAboard.add(
+    ReplyButton("AIFF"), ReplyButton("AAC"), ReplyButton("M4A"), ReplyButton("OGA"),
+    ReplyButton("WMA"), ReplyButton("FLAC"), ReplyButton("WAV"), ReplyButton("OPUS"),
+    ReplyButton("OGG"), ReplyButton("MP3"), ReplyButton("MKV"), ReplyButton("MP4"),
+    ReplyButton("MOV"), ReplyButton("AVI"), ReplyButton("GIF"), ReplyButton("M4B"),
+    ReplyButton("VOB"), ReplyButton("DVD"), ReplyButton("WEBM"), ReplyButton("WMV"),
+    ReplyButton("SENDVID"), ReplyButton("SENDDOC"), ReplyButton("SpeechToText"), ReplyButton("COLOR"),
+)
+
+# same as VAboard without COLOR, which needs a video stream
+AUDboard = ReplyKeyboard(row_width=3, one_time_keyboard=True,
+                         placeholder="convert to", resize_keyboard=True, selective=True)
+AUDboard.add(
     ReplyButton("AIFF"), ReplyButton("AAC"), ReplyButton("M4A"), ReplyButton("OGA"),
     ReplyButton("WMA"), ReplyButton("FLAC"), ReplyButton("WAV"), ReplyButton("OPUS"),
     ReplyButton("OGG"), ReplyButton("MP3"), ReplyButton("MKV"), ReplyButton("MP4"),
@@ -0,0 +1,65 @@
+# runs inside calibre's own python: calibre-debug -e calibreworker.py
+# calibre is imported once, then every job is a fork of this warm process
+import json
+import os
+import signal
+import socket
+import traceback
+
+from calibre.customize.ui import input_format_plugins, output_format_plugins
+from calibre.ebooks.conversion.cli import main as convert
+# not used here, imported on purpose so the conversion pipeline is already loaded in every fork
+import calibre.ebooks.conversion.plumber  # noqa: F401
+
+
+PATH = os.environ["CALIBRE_WORKER_SOCKET"]
+
+
+# the first reply line is the fork's pid, which leads its own process group so the bot can kill it
+def job(conn):
+    os.setsid()
+    conn.sendall((json.dumps({"pid": os.getpid()}) + "\n").encode())
+    request = json.loads(conn.makefile("r").readline())
+    argv = ["ebook-convert", request["input"], request["output"]] + request.get("options", [])
+    try:
+        code = convert(argv)
+        error = ""
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else 1
+        error = str(e.code)
+    except BaseException:
+        code = 1
+        error = traceback.format_exc()[-1000:]
+    conn.sendall((json.dumps({"code": code or 0, "error": error}) + "\n").encode())
+
+
+def serve():
+    # warm up the plugin tables, so forks don't redo it
+    list(input_format_plugins())
+    list(output_format_plugins())
+
+    # children are reaped by the kernel
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    # the socket only shows up at PATH once it is listening
+    temp = PATH + ".tmp"
+    if os.path.exists(temp):
+        os.remove(temp)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(temp)
+    server.listen(16)
+    os.rename(temp, PATH)
+
+    while True:
+        conn, _ = server.accept()
+        if os.fork() == 0:
+            # calibre's own subprocesses (pdftohtml...) need their exit codes, which SIG_IGN would reap away
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            server.close()
+            try:
+                job(conn)
+            finally:
+                os._exit(0)
+        conn.close()
+
+
+serve()
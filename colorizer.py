@@ -0,0 +1,200 @@
+import os
+import sys
+import queue
+import collections
+import threading
+import time
+import cv2
+import numpy as np
+
+
+# settings
+FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model")
+PROTOTXT = os.path.join(FOLDER, "colorization_deploy_v2.prototxt")
+MODEL = os.path.join(FOLDER, "colorization_release_v2.caffemodel")
+POINTS = os.path.join(FOLDER, "pts_in_hull.npy")
+NETS = int(os.environ.get("COLOR_NETS", 2))                 # forward passes that can run at once, each net holds its own weights
+BATCH = int(os.environ.get("COLOR_BATCH", 8))               # most images in one forward pass
+WINDOW = int(os.environ.get("COLOR_WINDOW", 5)) / 1000      # how long a forward pass waits for more images
+SIZE = 224
+
+lock = threading.Lock()
+requests = queue.Queue()
+started = False
+hull = None
+timings = []                    # seconds each net took to load
+sizes = collections.Counter()   # forward passes by batch size
+
+
+# a net with the cluster centers added as 1x1 convolutions
+def load():
+    global hull
+    begin = time.time()
+    with lock:
+        if hull is None:
+            hull = np.load(POINTS).transpose().reshape(2, 313, 1, 1).astype("float32")
+    net = cv2.dnn.readNetFromCaffe(PROTOTXT, MODEL)
+    net.getLayer(net.getLayerId("class8_ab")).blobs = [hull]
+    net.getLayer(net.getLayerId("conv8_313_rh")).blobs = [np.full([1, 313], 2.606, dtype="float32")]
+    timings.append(time.time() - begin)
+    print(f"colorizer : net {len(timings)} loaded in {timings[-1]:.2f}s")
+    return net
+
+
+# a colorization waiting for its batch
+class Request:
+
+    def __init__(self, L):
+        self.L = L
+        self.ab = None
+        self.error = None
+        self.done = threading.Event()
+
+
+def start():
+    global started
+    with lock:
+        if started:
+            return
+        started = True
+    for number in range(NETS):
+        threading.Thread(target=worker, name=f"colorizer-{number}", daemon=True).start()
+
+
+# requests that arrive within WINDOW of the first one (up to BATCH) share a forward pass
+def collect():
+    batch = [requests.get()]
+    deadline = time.time() + WINDOW
+    while len(batch) < BATCH:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(requests.get(timeout=remaining))
+        except queue.Empty:
+            break
+    return batch
+
+
+# owns one net, cv2.dnn.Net is not thread safe
+def worker():
+    net = None
+    while True:
+        batch = collect()
+        try:
+            if net is None:
+                net = load()
+            net.setInput(cv2.dnn.blobFromImages([request.L for request in batch]))
+            for request, ab in zip(batch, net.forward()):
+                request.ab = ab.transpose((1, 2, 0))
+            with lock:
+                sizes[len(batch)] += 1
+        except Exception as e:
+            print(f"colorizer : {e}")
+            for request in batch:
+                request.error = e
+        finally:
+            for request in batch:
+                request.done.set()
+
+
+# predicted ab channels (224x224x2) for the L channel of a lab image
+def predict(L):
+    start()
+    request = Request(L)
+    requests.put(request)
+    request.done.wait()
+    if request.error is not None:
+        raise request.error
+    return request.ab
+
+
+# bgr image from its lab version and predicted ab channels at full size
+def merge(lab, ab):
+    L = cv2.split(lab)[0]
+    colorized = np.concatenate((L[:, :, np.newaxis], ab), axis=2)
+    colorized = cv2.cvtColor(colorized, cv2.COLOR_LAB2BGR)
+    colorized = np.clip(colorized, 0, 1)
+    return (255 * colorized).astype("uint8")
+
+
+# the L channel the net takes
+def channel(lab):
+    L = cv2.split(cv2.resize(lab, (SIZE, SIZE)))[0]
+    L -= 50
+    return L
+
+
+# colorized copy of a bgr image
+def colorize(image):
+    scaled = image.astype("float32") / 255.0
+    lab = cv2.cvtColor(scaled, cv2.COLOR_BGR2LAB)
+    ab = cv2.resize(predict(channel(lab)), (image.shape[1], image.shape[0]))
+    return merge(lab, ab)
+
+
+# video frames (raw bgr24 bytes) colorized in a process of colorvideo's pool, with a net of its own
+# only keys are predicted, every other frame reuses the ab channels of the key before it (the first frame is a key)
+own = None
+
+def frames(batch, keys, width, height):
+    global own
+    if own is None:
+        own = load()
+    labs = [cv2.cvtColor(np.frombuffer(frame, dtype=np.uint8).reshape(height, width, 3).astype("float32") / 255.0,
+                         cv2.COLOR_BGR2LAB) for frame in batch]
+    own.setInput(cv2.dnn.blobFromImages([channel(lab) for lab, key in zip(labs, keys) if key]))
+    predicted = iter(own.forward())
+
+    colorized = []
+    for lab, key in zip(labs, keys):
+        if key:
+            ab = cv2.resize(next(predicted).transpose((1, 2, 0)), (width, height))
+        colorized.append(merge(lab, ab).tobytes())
+    return colorized
+
+
+# images per second of a single net at every batch size up to BATCH
+def benchmark(image, runs):
+    L = channel(cv2.cvtColor(image.astype("float32") / 255.0, cv2.COLOR_BGR2LAB))
+    net = load()
+    size = 1
+    while size <= BATCH:
+        blob = cv2.dnn.blobFromImages([L] * size)
+        net.setInput(blob)
+        net.forward()
+        begin = time.time()
+        for _ in range(runs):
+            net.setInput(blob)
+            net.forward()
+        took = time.time() - begin
+        print(f"batch {size}: {size * runs / took:.1f} images/s, {took / runs:.3f}s per pass")
+        size *= 2
+
+
+# images per second of colorize() called from many threads at once, through NETS nets and the batching window
+def concurrent(image, count):
+    begin = time.time()
+    threads = [threading.Thread(target=colorize, args=(image,)) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    took = time.time() - begin
+    print(f"{count} concurrent: {count / took:.1f} images/s, passes {report()}")
+
+
+# forward passes by batch size, as "passes x size"
+def report():
+    with lock:
+        return ", ".join(f"{count} x {size}" for size, count in sorted(sizes.items()))
+
+
+# python3 colorizer.py image.jpg [runs]
+# loading time and throughput against batch size on this machine, then how concurrent requests were batched
+if __name__ == "__main__":
+    image = cv2.imread(sys.argv[1])
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    benchmark(image, runs)
+    print(f"load: {timings[0]:.2f}s")
+    concurrent(image, BATCH * NETS * runs)
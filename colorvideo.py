@@ -0,0 +1,164 @@
+import os
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import cv2
+import numpy as np
+import jobctl
+import execute
+import progress
+import ffplan
+import colorizer
+
+
+# settings
+PROCS = int(os.environ.get("COLOR_PROCS", max(1, (os.cpu_count() or 2) // 2)))     # processes colorizing frames, each loads the model
+SCENE = float(os.environ.get("COLOR_SCENE", 4.0))      # mean difference (0-255) of frame thumbnails that starts a new scene
+REUSE = int(os.environ.get("COLOR_REUSE", 12))         # most frames that reuse one prediction even without a scene change
+FRAMES = int(os.environ.get("COLOR_FRAMES", 48))       # most frames in one batch
+MEMORY = int(os.environ.get("COLOR_MEMORY", 96)) * 1024 * 1024    # most raw frame bytes in one batch
+THUMB = (64, 36)
+
+lock = threading.Lock()
+pool = None
+
+
+# long lived, spawned rather than forked since the bot is full of threads
+# a spawned process imports main again, whose startup is behind its __main__ guard
+def processes():
+    global pool
+    with lock:
+        if pool is None:
+            pool = ProcessPoolExecutor(max_workers=PROCS, mp_context=multiprocessing.get_context("spawn"))
+        return pool
+
+
+# a pool with a dead process takes no more work, the next conversion starts a new one
+def broken(workers):
+    global pool
+    with lock:
+        if pool is workers:
+            pool = None
+    workers.shutdown(wait=False)
+
+
+# result of a batch, checking the job every second so a cancel or timeout isn't stuck behind the pool
+def result(future):
+    while True:
+        try:
+            return future.result(timeout=1)
+        except TimeoutError:
+            jobctl.check()
+
+
+def thumbnail(frame, width, height):
+    image = np.frombuffer(frame, dtype=np.uint8).reshape(height, width, 3)
+    return cv2.resize(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), THUMB, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+
+def videostream(streams):
+    for stream in streams:
+        if stream.get("codec_type") == "video" and not stream.get("disposition", {}).get("attached_pic"):
+            return stream
+    return None
+
+
+# colorize every frame of a video and re-encode it with the original audio, returns False if it couldn't
+# frames are decoded and encoded by ffmpeg pipes, batches of up to colorizer.BATCH scenes, FRAMES frames
+# and MEMORY bytes go to the process pool
+# status: progress key to show percent, speed and time left under
+def convert(inputt, output, status=None):
+    data = ffplan.info(inputt)
+    stream = videostream(data.get("streams", []))
+    if stream is None:
+        return False
+    width, height = int(stream["width"]), int(stream["height"])
+    rate = stream.get("avg_frame_rate", "0/0")
+    if rate.startswith("0"):
+        rate = stream.get("r_frame_rate", "25")
+    try:
+        duration = float(data["format"]["duration"])
+    except (KeyError, ValueError):
+        duration = 0
+    tracker = progress.Transcode(status, duration) if status is not None and duration > 0 else None
+
+    encoders = ffplan.CONTAINERS.get(output.split(".")[-1].lower(), {}).get("encoders", {})
+    video = encoders.get("video", "libx264")
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+           "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", rate, "-i", "pipe:0",
+           "-i", inputt, "-map", "0:v:0", "-map", "1:a?", "-c:v", video]
+    if video != "gif":
+        # yuv420p needs even dimensions
+        cmd += ["-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", "-pix_fmt", "yuv420p"]
+    cmd += ["-c:a", "copy", "-shortest", output]
+    cmd, lines = ffplan.tracked(cmd, tracker)
+
+    decoder = execute.start(["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", inputt, "-map", "0:v:0",
+                             "-f", "rawvideo", "-pix_fmt", "bgr24", "pipe:1"], stdout=True)
+    encoder = execute.start(cmd, stdin=True, lines=lines)
+
+    workers = processes()
+    inflight = deque()
+    batch, keys = [], []
+    size = width * height * 3
+    count = predicted = reused = 0
+    last = None
+    decoded = False
+
+    def submit():
+        inflight.append(workers.submit(colorizer.frames, batch, keys, width, height))
+        # decoding never runs more than a couple of batches per process ahead of the encoder
+        while len(inflight) > PROCS * 2:
+            write(inflight.popleft())
+
+    def write(future):
+        for frame in result(future):
+            encoder.stdin.write(frame)
+
+    try:
+        while True:
+            jobctl.check()
+            frame = decoder.stdout.read(size)
+            if len(frame) < size:
+                break
+            count += 1
+            thumb = thumbnail(frame, width, height)
+            changed = last is None or reused >= REUSE or np.mean(np.abs(thumb - last)) > SCENE
+            if batch and ((changed and sum(keys) >= colorizer.BATCH) or len(batch) >= FRAMES or len(batch) * size >= MEMORY):
+                submit()
+                batch, keys = [], []
+            # a batch only ever starts with a key, so a process never needs another one's prediction
+            if changed or not batch:
+                last, reused = thumb, 0
+                predicted += 1
+                keys.append(True)
+            else:
+                reused += 1
+                keys.append(False)
+            batch.append(frame)
+        decoded = True
+        if batch:
+            submit()
+        while inflight:
+            write(inflight.popleft())
+        encoder.stdin.close()
+    except BrokenPipeError:
+        pass
+    except BrokenProcessPool:
+        broken(workers)
+        raise
+    finally:
+        # batches nobody will write are dropped before a process picks them up
+        for future in inflight:
+            future.cancel()
+        if not decoded:
+            decoder.stop()
+        try:
+            decoder.finish()
+        finally:
+            result = encoder.finish()
+
+    print(f"colorvideo : {count} frames, {predicted} predicted")
+    return result.ok and count > 0 and os.path.exists(output) and os.path.getsize(output) > 0
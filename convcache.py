@@ -0,0 +1,171 @@
+import os
+import json
+import shutil
+import atexit
+import time
+import threading
+import itertools
+from collections import OrderedDict
+
+
+# settings
+ENTRIES = int(os.environ.get("CACHE_ENTRIES", 5000))            # remembered file_ids
+DBFILE = os.environ.get("CACHE_FILE", "convcache.json")          # "" to keep it only in memory
+LOCALDIR = os.environ.get("CACHE_DIR", "")                       # keep converted files here too, "" to disable
+LOCALBYTES = int(os.environ.get("CACHE_BYTES", 2 * 1024 ** 3))  # size budget of CACHE_DIR
+PREFIX = "convcache-"                                            # names of the copies kept in CACHE_DIR
+DELAY = 5                                                        # seconds puts are gathered before one save
+
+lock = threading.Lock()
+changed = threading.Condition(lock)
+dirty = False
+saving = False
+cache = OrderedDict()     # key -> [file_id, caption]
+local = OrderedDict()     # key -> [path, size]
+localsize = 0
+serial = itertools.count()
+
+
+# called once at startup, not on import, processes spawned by the bot import this module too
+def load():
+    if DBFILE != "" and os.path.exists(DBFILE):
+        try:
+            with open(DBFILE, "r") as dbfile:
+                for k, v in json.load(dbfile):
+                    cache[k] = v
+        except Exception as e:
+            print(f"convcache: {e}")
+
+    # copies aren't remembered across restarts, only the ones written here are removed
+    if LOCALDIR != "" and os.path.isdir(LOCALDIR):
+        for name in os.listdir(LOCALDIR):
+            if name.startswith(PREFIX):
+                try:
+                    os.remove(os.path.join(LOCALDIR, name))
+                except OSError:
+                    pass
+
+
+def save(entries):
+    tmp = DBFILE + ".tmp"
+    with open(tmp, "w") as dbfile:
+        json.dump(entries, dbfile)
+    os.replace(tmp, DBFILE)
+
+
+# writes the cache at most once per DELAY, outside of the lock
+def saver():
+    while True:
+        with changed:
+            changed.wait_for(lambda: dirty)
+        time.sleep(DELAY)
+        flush()
+
+
+def flush():
+    global dirty
+    with lock:
+        if not dirty:
+            return
+        dirty = False
+        entries = list(cache.items())
+    try:
+        save(entries)
+    except Exception as e:
+        print(f"convcache: {e}")
+
+
+def touch():
+    global dirty, saving
+    if DBFILE == "":
+        return
+    dirty = True
+    changed.notify()
+    if not saving:
+        saving = True
+        threading.Thread(target=saver, name="convcache", daemon=True).start()
+
+
+# cache key for a converted file
+def key(uniqueid, new, options=""):
+    if uniqueid is None:
+        return None
+    return f"{uniqueid}|{new.lower()}|{options}"
+
+
+# returns (file_id, caption) or None
+def get(k):
+    if k is None:
+        return None
+    with lock:
+        entry = cache.get(k)
+        if entry is None:
+            return None
+        cache.move_to_end(k)
+        return entry[0], entry[1]
+
+
+def put(k, file_id, caption=""):
+    if k is None or file_id is None:
+        return
+    with lock:
+        cache[k] = [file_id, caption]
+        cache.move_to_end(k)
+        while len(cache) > ENTRIES:
+            cache.popitem(last=False)
+        touch()
+
+
+def drop(k):
+    global localsize
+    with lock:
+        if cache.pop(k, None) is not None:
+            touch()
+        entry = local.pop(k, None)
+        if entry is not None:
+            localsize -= entry[1]
+            if os.path.exists(entry[0]):
+                os.remove(entry[0])
+
+
+# keep a copy of the converted file, least recently used ones are evicted over the budget
+def store(k, path):
+    global localsize
+    if k is None or LOCALDIR == "" or not os.path.exists(path):
+        return
+    size = os.path.getsize(path)
+    if size > LOCALBYTES:
+        return
+
+    os.makedirs(LOCALDIR, exist_ok=True)
+    dest = os.path.join(LOCALDIR, f"{PREFIX}{next(serial)}-{os.path.basename(path)}")
+    shutil.copyfile(path, dest)
+
+    with lock:
+        old = local.pop(k, None)
+        if old is not None:
+            localsize -= old[1]
+            if os.path.exists(old[0]):
+                os.remove(old[0])
+        local[k] = [dest, size]
+        localsize += size
+        while localsize > LOCALBYTES and local:
+            _, (epath, esize) = local.popitem(last=False)
+            localsize -= esize
+            if os.path.exists(epath):
+                os.remove(epath)
+
+
+# path of the kept copy or None
+def localpath(k):
+    if k is None:
+        return None
+    with lock:
+        entry = local.get(k)
+        if entry is None or not os.path.exists(entry[0]):
+            return None
+        local.move_to_end(k)
+        return entry[0]
+
+
+atexit.register(flush)
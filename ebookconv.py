@@ -0,0 +1,114 @@
+import json
+import os
+import signal
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import helperfunctions
+import execute
+import jobctl
+
+
+# settings
+MODE = os.environ.get("EBOOK_MODE", "fast")          # fast or quality (heuristics on every book)
+TIMEOUT = int(os.environ.get("EBOOK_TIMEOUT", 900))
+STARTUP = 30
+PATH = os.path.join(tempfile.gettempdir(), f"calibreworker-{os.getpid()}.sock")
+SCRIPT = os.path.join(helperfunctions.dirPath, "calibreworker.py")
+
+# inputs without structure, where heuristics are worth their time
+HEURISTIC = ("txt", "pdf")
+
+lock = threading.Lock()
+worker = None
+
+
+def heuristics(inputt, mode=MODE):
+    return mode == "quality" or inputt.split(".")[-1].lower() in HEURISTIC
+
+
+# starts calibre once, if needed; returns False if the worker can't run
+def ensure():
+    global worker
+    with lock:
+        if worker is not None and worker.poll() is None:
+            return True
+        if os.path.exists(PATH):
+            os.remove(PATH)
+        try:
+            worker = subprocess.Popen(["calibre-debug", "-e", SCRIPT], env={**os.environ, "CALIBRE_WORKER_SOCKET": PATH},
+                                      stdout=subprocess.DEVNULL, start_new_session=True)
+        except OSError as e:
+            print(f"calibre worker : {e}")
+            worker = None
+            return False
+
+        deadline = time.time() + STARTUP
+        while time.time() < deadline and worker.poll() is None:
+            if os.path.exists(PATH):
+                return True
+            time.sleep(0.2)
+        print("calibre worker did not start")
+        worker.kill()
+        worker = None
+        return False
+
+
+# next json line from the worker, raises socket.timeout past deadline or once the job is stopped
+def readline(conn, buffer, deadline, job):
+    while b"\n" not in buffer[0]:
+        try:
+            chunk = conn.recv(65536)
+        except socket.timeout:
+            if time.time() > deadline or jobctl.cancelled(job):
+                raise
+            continue
+        if not chunk:
+            raise ValueError("calibre worker closed the connection")
+        buffer[0] += chunk
+    line, _, buffer[0] = buffer[0].partition(b"\n")
+    return json.loads(line)
+
+
+# the fork doing the conversion is killed on timeout or cancel, the worker itself keeps running
+def request(inputt, output, options):
+    job = jobctl.current()
+    deadline = time.time() + TIMEOUT
+    buffer = [b""]
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.settimeout(1)
+        conn.connect(PATH)
+        conn.sendall((json.dumps({"input": os.path.abspath(inputt), "output": os.path.abspath(output),
+                                  "options": options}) + "\n").encode())
+        pid = readline(conn, buffer, deadline, job)["pid"]
+        try:
+            return readline(conn, buffer, deadline, job)
+        except socket.timeout:
+            try:
+                os.killpg(pid, signal.SIGKILL)
+            except OSError:
+                pass
+            raise
+
+
+# convert on the warm worker, the plain ebook-convert command if it is unavailable
+def convert(inputt, output, mode=MODE):
+    options = ["--enable-heuristics"] if heuristics(inputt, mode) else []
+    if ensure():
+        try:
+            reply = request(inputt, output, options)
+            if reply["code"] != 0:
+                print(f"calibre worker : {reply['error']}")
+            return
+        except socket.timeout:
+            jobctl.check()
+            print("calibre worker : timed out")
+            return
+        except (OSError, ValueError) as e:
+            print(f"calibre worker : {e}")
+            # a dead worker is restarted by the next job
+
+    # calibre's qt webengine reserves far more address space than it uses
+    execute.run(helperfunctions.calibrecommand(inputt, output, options), memory=None)
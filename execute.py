@@ -0,0 +1,184 @@
+import os
+import resource
+import subprocess
+import threading
+import time
+import jobctl
+
+
+# settings, every limit can be overridden per call (None to lift it)
+TIMEOUT = int(os.environ.get("EXEC_TIMEOUT", 3600))                 # wall clock seconds
+CPU = int(os.environ.get("EXEC_CPU", 6 * 3600))                     # cpu seconds, all threads together
+MEMORY = int(os.environ.get("EXEC_MEMORY", 4 * 1024 ** 3))          # address space bytes
+FILESIZE = int(os.environ.get("EXEC_FILESIZE", 8 * 1024 ** 3))      # biggest file a command may write
+TAIL = 2000                                                         # bytes of stderr kept
+
+
+# what a command did
+class Result:
+
+    def __init__(self, argv, returncode, stdout, stderr, usage, elapsed, timedout):
+        self.argv = argv
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.elapsed = elapsed
+        self.timedout = timedout
+        self.cpu = usage.ru_utime + usage.ru_stime if usage is not None else 0.0
+        self.maxrss = usage.ru_maxrss * 1024 if usage is not None else 0
+
+    @property
+    def ok(self):
+        return self.returncode == 0 and not self.timedout
+
+    def __str__(self):
+        status = "timed out" if self.timedout else f"exit {self.returncode}"
+        line = f"{os.path.basename(self.argv[0])} {status} in {self.elapsed:.1f}s, cpu {self.cpu:.1f}s, rss {self.maxrss // 1024 ** 2} MB"
+        if not self.ok and self.stderr:
+            line += f"\n    {self.stderr.decode(errors='ignore').strip()[-500:]}"
+        return line
+
+
+# keeps only the end of a stream
+def tail(stream, out, size):
+    data = b""
+    for chunk in iter(lambda: stream.read(65536), b""):
+        data = (data + chunk)[-size:]
+    out.append(data)
+
+
+def readall(stream, out):
+    out.append(stream.read())
+
+
+def readlines(stream, callback):
+    for line in stream:
+        try:
+            callback(line.decode(errors="ignore"))
+        except Exception as e:
+            print(f"execute line callback : {e}")
+
+
+def limit(pid, which, value, extra=0):
+    if value is None:
+        return
+    try:
+        resource.prlimit(pid, which, (value, value + extra))
+    except (OSError, ValueError):
+        pass
+
+
+# a command started with start(), its pipes are read or written by the caller while it runs
+class Running:
+
+    def __init__(self, argv, job, capture):
+        self.argv = argv
+        self.job = job
+        self.capture = capture
+        self.begin = time.time()
+        self.proc = None
+        self.owned = []         # pipes of the caller
+        self.timer = None
+        self.timedout = []
+        self.readers = []
+        self.out = []
+        self.err = []
+        self.stopped = False
+
+    @property
+    def stdin(self):
+        return self.proc.stdin
+
+    @property
+    def stdout(self):
+        return self.proc.stdout
+
+    # the caller doesn't need the rest of the output, the failure isn't reported
+    def stop(self):
+        self.stopped = True
+        if self.proc.returncode is None:
+            self.proc.kill()
+
+    # close the caller's pipes and wait for the command, returns its Result
+    def finish(self):
+        proc = self.proc
+        for pipe in self.owned:
+            try:
+                pipe.close()
+            except OSError:
+                pass
+        # wait4 instead of wait, for the resource usage of this one child
+        try:
+            _, status, usage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+        except ChildProcessError:
+            usage = None
+            proc.wait()
+        finally:
+            if self.timer is not None:
+                self.timer.cancel()
+            # a daemonized grandchild can hold the pipes open forever
+            for reader in self.readers:
+                reader.join(10)
+            if self.job is not None:
+                self.job.release(proc)
+
+        result = Result(self.argv, proc.returncode, (self.out[0] if self.out else b"") if self.capture else None,
+                        self.err[0] if self.err else b"", usage, time.time() - self.begin, bool(self.timedout))
+        if self.job is not None:
+            self.job.results.append(result)
+        if not result.ok and not self.stopped:
+            print(f"execute : {result}")
+        jobctl.check(self.job)
+        return result
+
+
+# start argv (no shell) as part of the current job, with a wall clock timeout and rlimits
+# stdin=True / stdout=True leave that pipe to the caller, finish() has to be called in any case
+def start(argv, timeout=TIMEOUT, cpu=CPU, memory=MEMORY, filesize=FILESIZE, stdin=False, stdout=False, capture=False,
+          lines=None, cwd=None, env=None, job=None):
+    job = job or jobctl.current()
+    running = Running(argv, job, capture)
+    proc = running.proc = jobctl.popen(argv, job, stdin=subprocess.PIPE if stdin else subprocess.DEVNULL,
+                                       stdout=subprocess.PIPE if stdout or capture or lines else subprocess.DEVNULL,
+                                       stderr=subprocess.PIPE, cwd=cwd, env=env)
+    # children forked from here on inherit the limits
+    limit(proc.pid, resource.RLIMIT_CPU, cpu, 5)      # SIGXCPU first, SIGKILL 5 seconds later
+    limit(proc.pid, resource.RLIMIT_AS, memory)
+    limit(proc.pid, resource.RLIMIT_FSIZE, filesize)
+
+    if timeout:
+        running.timer = threading.Timer(timeout, lambda: (running.timedout.append(True), jobctl.kill(proc)))
+        running.timer.daemon = True
+        running.timer.start()
+
+    running.readers.append(threading.Thread(target=tail, args=(proc.stderr, running.err, TAIL), daemon=True))
+    if capture:
+        running.readers.append(threading.Thread(target=readall, args=(proc.stdout, running.out), daemon=True))
+    elif lines:
+        running.readers.append(threading.Thread(target=readlines, args=(proc.stdout, lines), daemon=True))
+    elif stdout:
+        running.owned.append(proc.stdout)
+    if stdin:
+        running.owned.append(proc.stdin)
+    for reader in running.readers:
+        reader.start()
+    return running
+
+
+# run argv to the end, stdout is kept only with capture=True or handed to lines(line) as it comes, stderr's tail always
+def run(argv, timeout=TIMEOUT, cpu=CPU, memory=MEMORY, filesize=FILESIZE, capture=False, lines=None, input=None,
+        cwd=None, env=None, job=None):
+    running = start(argv, timeout, cpu, memory, filesize, stdin=input is not None, capture=capture, lines=lines,
+                    cwd=cwd, env=env, job=job)
+    if input is not None:
+        try:
+            running.stdin.write(input)
+        except (BrokenPipeError, OSError):
+            pass
+    return running.finish()
+
+
+# every command a job ran
+def report(job):
+    return "\n".join(str(result) for result in job.results)
@@ -0,0 +1,295 @@
+import os
+import sys
+import time
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+import jobctl
+import execute
+import mediainfo
+import progress
+
+
+# settings
+SEGMENT_SIZE = int(os.environ.get("SEGMENT_SIZE", 300 * 1024 ** 2))   # split inputs bigger than this
+SEGMENT_DURATION = int(os.environ.get("SEGMENT_DURATION", 600))       # or longer than this (seconds)
+SEGMENT_JOBS = int(os.environ.get("SEGMENT_JOBS", os.cpu_count() or 2))
+
+# machine readable progress on stdout
+PROGRESS = ["-progress", "pipe:1", "-nostats"]
+
+
+# what each output container can hold without re-encoding, and what to encode to otherwise
+# None means any codec of that kind can be copied, a missing kind is dropped
+CONTAINERS = {
+    "mp4":  {"video": {"h264", "hevc", "mpeg4", "av1", "vp9"}, "audio": {"aac", "mp3", "alac", "opus", "ac3", "eac3", "flac"}, "subtitle": {"mov_text"},
+             "encoders": {"video": "libx264", "audio": "aac", "subtitle": "mov_text"}},
+    "mov":  {"video": {"h264", "hevc", "mpeg4", "prores", "mjpeg"}, "audio": {"aac", "mp3", "alac", "pcm_s16le", "ac3"}, "subtitle": {"mov_text"},
+             "encoders": {"video": "libx264", "audio": "aac", "subtitle": "mov_text"}},
+    "mkv":  {"video": None, "audio": None, "subtitle": None,
+             "encoders": {"video": "libx264", "audio": "aac", "subtitle": "srt"}},
+    "webm": {"video": {"vp8", "vp9", "av1"}, "audio": {"opus", "vorbis"}, "subtitle": {"webvtt"},
+             "encoders": {"video": "libvpx-vp9", "audio": "libopus", "subtitle": "webvtt"}},
+    "avi":  {"video": {"mpeg4", "h264", "mjpeg", "msmpeg4v2", "msmpeg4v3"}, "audio": {"mp3", "ac3", "pcm_s16le"},
+             "encoders": {"video": "mpeg4", "audio": "libmp3lame"}},
+    "wmv":  {"video": {"wmv1", "wmv2"}, "audio": {"wmav1", "wmav2"},
+             "encoders": {"video": "wmv2", "audio": "wmav2"}},
+    "vob":  {"video": {"mpeg1video", "mpeg2video"}, "audio": {"ac3", "mp2", "pcm_dvd"},
+             "encoders": {"video": "mpeg2video", "audio": "ac3"}},
+    "dvd":  {"video": {"mpeg1video", "mpeg2video"}, "audio": {"ac3", "mp2", "pcm_dvd"},
+             "encoders": {"video": "mpeg2video", "audio": "ac3"}},
+    "gif":  {"video": {"gif"},
+             "encoders": {"video": "gif"}},
+    "m4a":  {"audio": {"aac", "alac"}, "encoders": {"audio": "aac"}},
+    "m4b":  {"audio": {"aac", "alac"}, "encoders": {"audio": "aac"}},
+    "aac":  {"audio": {"aac"}, "encoders": {"audio": "aac"}},
+    "mp3":  {"audio": {"mp3"}, "encoders": {"audio": "libmp3lame"}},
+    "ogg":  {"audio": {"vorbis", "opus", "flac"}, "encoders": {"audio": "libvorbis"}},
+    "oga":  {"audio": {"vorbis", "opus", "flac"}, "encoders": {"audio": "libvorbis"}},
+    "opus": {"audio": {"opus"}, "encoders": {"audio": "libopus"}},
+    "flac": {"audio": {"flac"}, "encoders": {"audio": "flac"}},
+    "wav":  {"audio": {"pcm_s16le", "pcm_s24le", "pcm_f32le", "pcm_u8"}, "encoders": {"audio": "pcm_s16le"}},
+    "aiff": {"audio": {"pcm_s16be", "pcm_s24be"}, "encoders": {"audio": "pcm_s16be"}},
+    "wma":  {"audio": {"wmav1", "wmav2"}, "encoders": {"audio": "wmav2"}},
+}
+
+# text subtitles can be converted between formats, bitmap ones can only be copied
+TEXTSUBS = {"subrip", "srt", "ass", "ssa", "webvtt", "mov_text", "text"}
+
+# codecs usually found behind an extension, to guess before the file is on disk
+EXTCODECS = {
+    "mp3": ["mp3"], "aac": ["aac"], "m4a": ["aac"], "m4b": ["aac"], "flac": ["flac"], "opus": ["opus"],
+    "ogg": ["vorbis", "opus"], "oga": ["vorbis", "opus"], "wav": ["pcm_s16le"], "aiff": ["pcm_s16be"],
+    "wma": ["wmav2"], "wmv": ["wmv2", "wmav2"], "webm": ["vp9", "vp8", "opus", "vorbis"],
+    "mkv": ["h264", "hevc", "aac", "opus"], "mp4": ["h264", "aac"], "mov": ["h264", "aac"],
+    "avi": ["mpeg4", "mp3"], "vob": ["mpeg2video", "ac3"], "dvd": ["mpeg2video", "ac3"],
+}
+
+
+# encoders that use few cores on their own, worth splitting the input for
+SLOWENCODERS = {"libvpx", "libvpx-vp9", "wmv2", "mpeg2video", "mpeg4"}
+
+
+def info(file, uid=None):
+    return mediainfo.probe(file, uid)
+
+
+def probe(file, uid=None):
+    return mediainfo.streams(file, uid)
+
+
+def allowed(container, kind, codec):
+    if kind not in container:
+        return False
+    codecs = container[kind]
+    return codecs is None or codec in codecs
+
+
+# per stream decision: ("copy" | encoder name | None to drop) for every input stream
+def plan(streams, new, copy=True):
+    container = CONTAINERS.get(new)
+    if container is None:
+        return None
+
+    decisions = []
+    for stream in streams:
+        kind = stream.get("codec_type")
+        codec = stream.get("codec_name")
+        attached = stream.get("disposition", {}).get("attached_pic", 0) == 1
+
+        if kind not in ("video", "audio", "subtitle") or kind not in container["encoders"]:
+            decisions.append(None)
+        elif copy and allowed(container, kind, codec):
+            decisions.append("copy")
+        elif kind == "subtitle" and codec not in TEXTSUBS:
+            decisions.append(None)
+        elif attached:
+            decisions.append(None)
+        else:
+            decisions.append(container["encoders"][kind])
+
+    # gif and audio containers take one stream of their kind
+    if new == "gif" or "video" not in container:
+        first = {}
+        for i, stream in enumerate(streams):
+            kind = stream.get("codec_type")
+            if decisions[i] is not None:
+                if kind in first:
+                    decisions[i] = None
+                else:
+                    first[kind] = i
+
+    return decisions
+
+
+# ffmpeg output args for a plan
+def planargs(streams, decisions):
+    args = []
+    out = 0
+    for stream, decision in zip(streams, decisions):
+        if decision is None:
+            continue
+        args += ["-map", f"0:{stream['index']}", f"-c:{out}", decision]
+        out += 1
+    if out == 0:
+        return None
+    return args
+
+
+# commands from cheapest to safest
+def commands(inputt, output, new, streams=None):
+    base = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-i", inputt]
+    if streams is None:
+        streams = probe(inputt)
+
+    cmds = []
+    for copy in (True, False):
+        decisions = plan(streams, new, copy)
+        if decisions is None:
+            break
+        args = planargs(streams, decisions)
+        if args is not None and base + args + [output] not in cmds:
+            cmds.append(base + args + [output])
+    cmds.append(base + [output])
+    return cmds
+
+
+# ffmpeg command reporting its progress to tracker
+def tracked(cmd, tracker, part=0):
+    if tracker is None:
+        return cmd, None
+    return cmd[:1] + PROGRESS + cmd[1:], tracker.reader(part)
+
+
+# run the plan, falling back to the next command if one fails
+# segment: None decides by size/duration, True/False forces the segmented mode on/off
+# status: progress key to show percent, speed and time left under
+def convert(inputt, output, new, segment=None, uid=None, status=None):
+    data = info(inputt, uid)
+    streams = data.get("streams", [])
+    try:
+        duration = float(data["format"]["duration"])
+    except (KeyError, ValueError):
+        duration = 0
+    tracker = progress.Transcode(status, duration) if status is not None and duration > 0 else None
+
+    decisions = plan(streams, new)
+    if decisions is not None and segmentable(inputt, data, decisions, segment):
+        if segmented(inputt, output, streams, decisions, duration, tracker):
+            return True
+        print("ffplan segmented transcode failed, doing it in one go")
+
+    for cmd in commands(inputt, output, new, streams):
+        if tracker is not None:
+            tracker.reset()
+        run, lines = tracked(cmd, tracker)
+        result = execute.run(run, lines=lines)
+        if result.returncode == 0 and os.path.exists(output) and os.path.getsize(output) > 0:
+            return True
+        print(f"ffplan failed {' '.join(cmd[7:])} : {result.stderr.decode(errors='ignore')[-300:]}")
+        if os.path.exists(output):
+            os.remove(output)
+    return False
+
+
+# could some of the streams be copied, judging only by the extensions
+def maycopy(inputt, new):
+    container = CONTAINERS.get(new)
+    if container is None:
+        return False
+    for codec in EXTCODECS.get(inputt.split(".")[-1].lower(), []):
+        for kind in ("video", "audio"):
+            if kind in container and container[kind] is not None and codec in container[kind]:
+                return True
+            if kind in container and container[kind] is None:
+                return True
+    return False
+
+
+# segmented transcode, splits the video at keyframes and encodes the pieces in parallel ffmpeg processes
+def segmentable(inputt, data, decisions, segment=None):
+    if segment is False:
+        return False
+    streams = data.get("streams", [])
+    kinds = [stream.get("codec_type") for stream, decision in zip(streams, decisions) if decision is not None]
+    encoders = [decision for stream, decision in zip(streams, decisions) if decision is not None and stream.get("codec_type") == "video"]
+
+    if kinds.count("video") != 1 or kinds.count("audio") > 1 or "subtitle" in kinds:
+        return False
+    if encoders[0] not in SLOWENCODERS or SEGMENT_JOBS < 2:
+        return False
+    try:
+        duration = float(data["format"]["duration"])
+    except (KeyError, ValueError):
+        return False
+    if segment is True:
+        return duration > 0
+    return os.path.getsize(inputt) > SEGMENT_SIZE or duration > SEGMENT_DURATION
+
+
+def segmented(inputt, output, streams, decisions, duration, tracker=None):
+    work = output + ".parts"
+    shutil.rmtree(work, ignore_errors=True)
+    os.makedirs(work)
+    base = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y"]
+    job = jobctl.current()     # the encoders run on pool threads
+    threads = str(max(1, (os.cpu_count() or 2) // SEGMENT_JOBS))
+
+    video = [(stream, decision) for stream, decision in zip(streams, decisions) if decision is not None and stream.get("codec_type") == "video"][0]
+    audio = [(stream, decision) for stream, decision in zip(streams, decisions) if decision is not None and stream.get("codec_type") == "audio"]
+
+    try:
+        # split without re-encoding, the segment muxer cuts on keyframes
+        result = execute.run(base + ["-i", inputt, "-map", f"0:{video[0]['index']}", "-c", "copy", "-f", "segment",
+                              "-segment_time", str(max(10, duration / SEGMENT_JOBS)), "-reset_timestamps", "1",
+                              os.path.join(work, "src%04d.mkv")])
+        parts = sorted(name for name in os.listdir(work) if name.startswith("src"))
+        if result.returncode != 0 or len(parts) == 0:
+            return False
+
+        def encode(part):
+            out = os.path.join(work, part.replace("src", "enc"))
+            cmd, lines = tracked(base + ["-i", os.path.join(work, part), "-map", "0:v:0", "-c:v", video[1], "-threads", threads, out], tracker, part)
+            result = execute.run(cmd, lines=lines, job=job)
+            return result.returncode == 0 and os.path.exists(out)
+
+        def encodeaudio():
+            out = os.path.join(work, "audio.mkv")
+            result = execute.run(base + ["-i", inputt, "-map", f"0:{audio[0][0]['index']}", "-c:a", audio[0][1], out], job=job)
+            return result.returncode == 0 and os.path.exists(out)
+
+        if tracker is not None:
+            tracker.reset()
+        with ThreadPoolExecutor(max_workers=SEGMENT_JOBS) as pool:
+            audiojob = pool.submit(encodeaudio) if audio else None
+            if not all(pool.map(encode, parts)):
+                return False
+            if audiojob is not None and not audiojob.result():
+                return False
+
+        with open(os.path.join(work, "list.txt"), "w") as listfile:
+            for part in parts:
+                listfile.write(f"file '{part.replace('src', 'enc')}'\n")
+
+        cmd = base + ["-f", "concat", "-safe", "0", "-i", os.path.join(work, "list.txt")]
+        if audio:
+            cmd += ["-i", os.path.join(work, "audio.mkv"), "-map", "0:v", "-map", "1:a"]
+        result = execute.run(cmd + ["-c", "copy", output])
+        if result.returncode != 0:
+            print(f"ffplan concat : {result.stderr.decode(errors='ignore')[-300:]}")
+        return result.returncode == 0 and os.path.exists(output) and os.path.getsize(output) > 0
+
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+# benchmark single process against segmented : python3 ffplan.py input.mkv webm
+if __name__ == "__main__":
+    inputt, new = sys.argv[1], sys.argv[2]
+    for segment in (False, True):
+        output = f"bench-{'segmented' if segment else 'single'}.{new}"
+        start = time.time()
+        ok = convert(inputt, output, new, segment)
+        size = os.path.getsize(output) if os.path.exists(output) else 0
+        print(f"{'segmented' if segment else 'single'} : {time.time() - start:.1f}s ok={ok} size={size}")
+        if os.path.exists(output):
+            os.remove(output)
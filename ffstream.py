@@ -0,0 +1,32 @@
+import os
+import execute
+
+
+# settings
+ENABLED = os.environ.get("FFSTREAM", "1") == "1"
+
+# inputs ffmpeg can demux from a pipe (no index at the end of the file like mp4/mov/m4a)
+STREAMABLE = ("AIFF", "AAC", "OGA", "WMA", "FLAC", "WAV", "OPUS", "OGG", "MP3", "MKV", "AVI", "VOB", "WEBM", "WMV", "TS")
+
+
+def streamable(inputt):
+    return ENABLED and inputt.upper().endswith(STREAMABLE)
+
+
+# feed chunks (an iterable of bytes) into ffmpeg's stdin while it writes output
+# returns True if ffmpeg finished without error
+def transcode(chunks, output, args=[]):
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-i", "pipe:0"] + list(args) + [output]
+    running = execute.start(cmd, stdin=True)
+    try:
+        for chunk in chunks:
+            running.stdin.write(chunk)
+    except (BrokenPipeError, OSError):
+        pass
+    except BaseException:
+        running.stop()
+        raise
+    finally:
+        result = running.finish()
+
+    return result.ok and os.path.exists(output) and os.path.getsize(output) > 0
@@ -0,0 +1,84 @@
+import json
+import os
+import queue
+import select
+import subprocess
+import time
+import helperfunctions
+import execute
+import jobctl
+
+
+# settings
+WORKERS = int(os.environ.get("FONT_WORKERS", 1))
+TIMEOUT = int(os.environ.get("FONT_TIMEOUT", 300))
+SCRIPT = os.path.join(helperfunctions.dirPath, "fontworker.py")
+
+idle = queue.Queue()
+for _ in range(WORKERS):
+    idle.put(None)      # started on first use
+
+
+def spawn():
+    return subprocess.Popen(["fontforge", "-lang=py", "-script", SCRIPT], stdin=subprocess.PIPE,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, bufsize=1)
+
+
+# waits in one second steps, raises jobctl.Cancelled once job is stopped
+def request(worker, inputt, outputs, job):
+    worker.stdin.write(json.dumps({"input": inputt, "outputs": outputs}) + "\n")
+    worker.stdin.flush()
+    deadline = time.time() + TIMEOUT
+    while not select.select([worker.stdout], [], [], 1)[0]:
+        jobctl.check(job)
+        if time.time() > deadline:
+            raise TimeoutError("font worker timed out")
+    line = worker.stdout.readline()
+    if not line:
+        raise EOFError("font worker exited")
+    return json.loads(line)
+
+
+# convert one font to every output with a single open, returns the outputs that were made
+def convert(inputt, outputs):
+    inputt = os.path.abspath(inputt)
+    outputs = [os.path.abspath(output) for output in outputs]
+    job = jobctl.current()
+    while True:
+        try:
+            worker = idle.get(timeout=1)
+            break
+        except queue.Empty:
+            jobctl.check(job)
+    try:
+        if worker is None or worker.poll() is not None:
+            worker = spawn()
+        reply = request(worker, inputt, outputs, job)
+        if reply["error"]:
+            print(f"font worker : {reply['error']}")
+        return reply["done"]
+    except jobctl.Cancelled:
+        # the worker is still busy with the font, a fresh one is started by the next conversion
+        if worker is not None:
+            worker.kill()
+            worker.wait()
+        worker = None
+        raise
+    except (OSError, ValueError, TimeoutError, EOFError) as e:
+        print(f"font worker : {e}")
+        if worker is not None:
+            worker.kill()
+            worker.wait()
+        worker = None
+        # a font that hangs the worker would hang a fresh fontforge too
+        if isinstance(e, TimeoutError):
+            return []
+    finally:
+        idle.put(worker)
+
+    # one off run of the same script
+    try:
+        execute.run(helperfunctions.fontforgecommand(inputt, outputs))
+    except OSError as e:
+        print(f"fontforge : {e}")
+    return [output for output in outputs if os.path.exists(output)]
@@ -0,0 +1,40 @@
+# runs inside fontforge: fontforge -lang=py -script fontworker.py
+# with no arguments it takes json jobs on stdin, one per line, and answers each on stdout
+# with arguments (input output...) it does that one job and exits
+import json
+import os
+import sys
+import fontforge
+
+
+# opens the font once for every output
+def job(inputt, outputs):
+    font = fontforge.open(inputt)
+    try:
+        done = []
+        for output in outputs:
+            font.generate(output)
+            done.append(output)
+        return done
+    finally:
+        font.close()
+
+
+def serve():
+    # replies get the real stdout, anything fontforge prints goes to stderr
+    replies = os.fdopen(os.dup(1), "w")
+    os.dup2(2, 1)
+    for line in sys.stdin:
+        request = json.loads(line)
+        try:
+            reply = {"done": job(request["input"], request["outputs"]), "error": ""}
+        except Exception as e:
+            reply = {"done": [], "error": str(e)}
+        replies.write(json.dumps(reply) + "\n")
+        replies.flush()
+
+
+if len(sys.argv) > 2:
+    job(sys.argv[1], sys.argv[2:])
+else:
+    serve()
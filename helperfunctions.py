@@ -1,32 +1,32 @@
 import os
-from telegraph import Telegraph
 from pyzbar.pyzbar import decode
 from PIL import Image
+import mediainfo
+import workspace
+import execute
 
 
 # setting
 currentFile = __file__
 realPath = os.path.realpath(currentFile)
 dirPath = os.path.dirname(realPath)
-telegraph = Telegraph()
-telegraph.create_account(short_name='file-converter')
 
 
 # pyinstaller compile
 def pyinstallcommand(message,inputt):
-    ofold = str(message.id) + "/"
-    tfold = str(message.id) + "t/"
+    ofold = workspace.path(str(message.id) + "/")
+    tfold = workspace.path(str(message.id) + "t/")
     basename = inputt.split("/")[-1].split(".")[0]
     out = ofold + basename
-    temp = basename + ".spec"
-    cmd = f'pyinstaller --onefile --distpath {ofold} --workpath {tfold} {inputt}'
+    temp = workspace.path(basename + ".spec")
+    cmd = ["pyinstaller", "--onefile", "--distpath", ofold, "--workpath", tfold, "--specpath", os.path.dirname(temp) or ".", inputt]
     return cmd, out, ofold, tfold, temp
 
 
 # g++ compile command
 def gppcommand(inputt):
-    filename = inputt.split("/")[-1].split(".")[0]
-    cmd = f'g++ -o {filename} {inputt}'
+    filename = workspace.output(inputt.split("/")[-1].split(".")[0])
+    cmd = ["g++", "-o", filename, inputt]
     return cmd, filename
 
 
@@ -41,71 +41,55 @@ def scanner(file):
 
 # compiling jar command
 def warpcommand(inputt,message,optimize=False):
+    folder = workspace.path(f'warp{message.id}')
     if not optimize:
-        cmd = f'warp4j {inputt} -o warp{message.id}'
+        cmd = ["warp4j", inputt, "-o", folder]
     else:
-        cmd = f'warp4j {inputt} --no-optimize -o warp{message.id}'
+        cmd = ["warp4j", inputt, "--no-optimize", "-o", folder]
 
     filename = inputt.split("/")[-1].replace(".jar","")
-    filelist = [f'warp{message.id}/{filename}-linux-x64', f'warp{message.id}/{filename}-macos-x64', f'warp{message.id}/{filename}-windows-x64.exe']
-    return cmd,f'warp{message.id}/',filelist
+    filelist = [f'{folder}/{filename}-linux-x64', f'{folder}/{filename}-macos-x64', f'{folder}/{filename}-windows-x64.exe']
+    return cmd,f'{folder}/',filelist
 
 
 # ctmconv 3d file cmd
 def ctm3dcommand(inputt,output):
-    cmd = f'ctmconv {inputt} {output}'
+    cmd = ["ctmconv", inputt, output]
     return cmd
 
 
 # ttconv subtiles cmd
 def subtitlescommand(inputt,output):
-    cmd = f'tt convert -i {inputt} -o {output}'
+    cmd = ["tt", "convert", "-i", inputt, "-o", output]
     return cmd
 
 
 # calibre cmd
-def calibrecommand(inputt,output):
-    cmd = f'ebook-convert "{inputt}" "{output}" --enable-heuristics'
+def calibrecommand(inputt,output,options=[]):
+    cmd = ["ebook-convert", inputt, output] + options
     return cmd
 
 
 # fontforge cmd
-def fontforgecommand(inputt,output,message):
-    des = dirPath + f"/{output}"
-    cdes = dirPath + f"/{message.id}-convert.pe"
-    text = f'Open(\'{inputt}\')\nGenerate(\'{des}\')'
-    with open(f"{message.id}-convert.pe","w") as file:
-        file.write(text)
-    os.system(f"chmod 777 {message.id}-convert.pe")
-    #cmd = f'{fontforge} --appimage-extract-and-run -script "{cdes}"'
-    cmd = f'fontforge -script "{cdes}"'
+def fontforgecommand(inputt,outputs):
+    cmd = ["fontforge", "-lang=py", "-script", dirPath + "/fontworker.py", inputt] + outputs
     return cmd
 
 
 # libreoffice cmd
-def libreofficecommand(inputt,new):
-    #cmd = f'{libreoffice} --appimage-extract-and-run --headless --convert-to "{new}" "{inputt}" --outdir "{dirPath}"'
+def libreofficecommand(inputt,new,profile,outdir=dirPath):
+    cmd = ["libreoffice", f"-env:UserInstallation=file://{profile}", "--headless"]
     if inputt.split(".")[-1] == 'pdf':
-        cmd = f'libreoffice --infilter=="writer_pdf_import" --headless --convert-to "{new}":"writer_pdf_Export" "{inputt}" --outdir "{dirPath}"'
+        cmd += ["--infilter=writer_pdf_import", "--convert-to", f"{new}:writer_pdf_Export"]
     else:
-        cmd = f'libreoffice --headless --convert-to "{new}" "{inputt}" --outdir "{dirPath}"'
-    return cmd
+        cmd += ["--convert-to", new]
+    return cmd + [inputt, "--outdir", outdir]
 
 
 # tesseract cmd
 def tesrctcommand(inputt,out):
     #cmd = f'{tesseract} --appimage-extract-and-run "{inputt}" "{output}"'
-    cmd = f'tesseract "{inputt}" {out}'
-    return cmd
-
-
-# ffmpeg cmd
-def ffmpegcommand(inputt,output,new):
-    #cmd = f'{ffmpeg} -i "{inputt}" "{output}"'
-    if new in  ["mp4", "mkv", "mov"] and not (new == "mov" and ".webm" in inputt):
-        cmd = f'ffmpeg -i "{inputt}" -c copy "{output}"'
-    else:
-        cmd = f'ffmpeg -i "{inputt}" "{output}"'
+    cmd = ["tesseract", inputt, out]
     return cmd
 
 
@@ -113,23 +97,24 @@ def ffmpegcommand(inputt,output,new):
 def magickcommand(inputt,output,new):
     #cmd = f'{magick} --appimage-extract-and-run "{inputt}" "{output}"'
     if new == "ico":
-        cmd = "convert"
+        # fallback for inputs imageengine.buildico can't read
+        cmd = ["convert"]
         slist = ["256", "128", "96", "64", "48", "32", "16"]
         for ele in slist:
            toutput = updtname(inputt,f"{ele}.png")
-           tcmd = f'convert "{inputt}" -resize {ele}x{ele}\! "{toutput}"'
-           os.system(tcmd)
-           cmd = f'{cmd} "{toutput}"'
-        cmd = f'{cmd} "{output}"'
+           execute.run(["convert", inputt, "-resize", f"{ele}x{ele}!", toutput])
+           cmd.append(toutput)
+        cmd.append(output)
     else:
-        cmd = f'convert "{inputt}" "{output}"'
+        cmd = ["convert", inputt, output]
     return cmd  
 
 
 # 7zip cmd
 def zipcommand(file,message):
-    cmd = f'7z x "{file}" -o{message.id}z > {message.id}zl'
-    return cmd, f'{message.id}z', f'{message.id}zl'
+    folder = workspace.path(f'{message.id}z')
+    cmd = ["7z", "x", file, f"-o{folder}"]
+    return cmd, folder
 
 
 # get files
@@ -153,61 +138,49 @@ def updtname(inputt,new):
     print(output)
     return output
 
-# image info
-def imageinfo(file):
-    cmd = f'identify -verbose {file} > "{file}.txt"'
-    os.system(cmd)
+# info page title
+def pagetitle(file):
+    return os.path.basename(file)
+
 
-    with open(f'{file}.txt', "rb") as infile:
-        info = str(infile.read())
-    os.remove(f'{file}.txt')
+# image info page (title, html)
+def imagepage(file):
+    info = str(execute.run(["identify", "-verbose", file], capture=True).stdout)
    
     info = info.replace(":", ": ")
     info = info.replace("b'","")
     info = info.replace("'","")
     info = info.replace("\\n","<br>")
-    
-    file = file.split("downloads")[-1]
-    if file[0] == '/':
-       file = file[1:]
-    try:
-        response = telegraph.create_page(f'{file.replace("./", "")}', html_content=f"<p>{info}</p>")
-    except:
-        return "Error in getting Info"
-    return response['url']
-
-
-# video info
-def videoinfo(file):
-    cmd = f'ffprobe -v quiet -show_format -show_streams "{file}" > "{file}.txt"'
-    os.system(cmd)
-    with open(f'{file}.txt', "rb") as infile:
-        info = str(infile.read())
-
-    os.remove(f'{file}.txt')
-
-    stream = info[10:].split("[/STREAM]")
-    try:
-        formats = str(stream[1])[10:-12]
-    except:
-        formats = ""
-    stream = stream[0]
-
-    info = formats + stream[2:]
-    info = info.replace("=", "     =        ")
-    info = info.replace("\\n", "<br>")
+    return pagetitle(file), f"<p>{info}</p>"
+
+
+# video info page (title, html)
+def videopage(file,uid=None):
+    info = mediainfo.infotext(file,uid)
     info = info.replace(":", "   ")
     info = info.replace("./", "")
+    return pagetitle(file), f"<p>{info}</p>"
+
+
+# telegram media of a message
+def getmedia(message):
+    for media in ["document", "video", "audio", "voice", "video_note", "photo", "sticker", "animation"]:
+        obj = getattr(message, media, None)
+        if obj is not None:
+            return obj
+    return None
+
+
+# telegram file unique id of a media message
+def uniqueid(message):
+    media = getmedia(message)
+    return None if media is None else media.file_unique_id
+
 
-    file = file.split("downloads")[-1]
-    if file[0] == "/":
-        file = file[1:]
-    
-    try:
-        response = telegraph.create_page(f'{file.replace("./", "")}', html_content=f"<p>{info}</p>")
-    except:
-        return "Error in getting Info"
-    return response["url"]   
+# telegram file size of a media message
+def filesize(message):
+    media = getmedia(message)
+    return None if media is None else media.file_size
 
 
 # list beautifier
@@ -0,0 +1,86 @@
+import os
+import threading
+from PIL import Image
+from wand.image import Image as WandImage
+from wand.resource import limits
+
+
+# settings
+ICOSIZES = [256, 128, 96, 64, 48, 32, 16]
+WORKERS = int(os.environ.get("IMAGE_WORKERS", os.cpu_count() or 2))
+MEMORY = int(os.environ.get("IMAGE_MEMORY", 256 * 1024 ** 2))     # pixel cache in ram per process, rest goes to disk
+DISK = int(os.environ.get("IMAGE_DISK", 2 * 1024 ** 3))           # pixel cache on disk, bigger images fail
+
+# left to the convert command
+EXOTIC = ("svg", "ocr")
+# formats that keep every frame
+MULTIFRAME = ("gif", "tiff", "webp")
+
+limits['memory'] = MEMORY
+limits['disk'] = DISK
+slots = threading.BoundedSemaphore(WORKERS)
+
+
+# multi resolution ico in one decode, each size is resampled from the previous (bigger) one
+# returns False if pillow can't read the input (svg ...) so the caller can fall back to imagemagick
+def buildico(inputt, output, sizes=ICOSIZES):
+    try:
+        with Image.open(inputt) as img:
+            img.seek(0)
+            current = img.convert("RGBA")
+    except Exception as e:
+        print(f"imageengine ico : {e}")
+        return False
+
+    frames = []
+    for size in sorted(sizes, reverse=True):
+        current = current.resize((size, size), Image.LANCZOS)
+        frames.append(current)
+
+    frames[0].save(output, format="ICO", sizes=[frame.size for frame in frames], append_images=frames[1:])
+    return True
+
+
+# info page html of a decoded image
+def describe(img):
+    lines = [
+        f"Format: {img.format}",
+        f"Geometry: {img.width}x{img.height}",
+        f"Frames: {len(img.sequence)}",
+        f"Colorspace: {img.colorspace}",
+        f"Type: {img.type}",
+        f"Depth: {img.depth}-bit",
+        f"Alpha: {img.alpha_channel}",
+        f"Compression: {img.compression}",
+        f"Resolution: {img.resolution[0]}x{img.resolution[1]}",
+    ]
+    for k, v in img.metadata.items():
+        lines.append(f"{k}: {v}")
+    return "<p>" + "<br>".join(lines) + "</p>"
+
+
+# convert in-process, decoding the input once
+# returns (source info html, converted info html) or None if the convert command should do it
+def convert(inputt, output, new):
+    if new in EXOTIC or inputt.lower().endswith(EXOTIC):
+        return None
+
+    with slots:
+        try:
+            with WandImage(filename=inputt) as img:
+                srcinfo = describe(img)
+                if new not in MULTIFRAME and len(img.sequence) > 1:
+                    with WandImage(image=img.sequence[0]) as first:
+                        return srcinfo, save(first, output, new)
+                return srcinfo, save(img, output, new)
+        except Exception as e:
+            print(f"imageengine convert : {e}")
+            if os.path.exists(output):
+                os.remove(output)
+            return None
+
+
+def save(img, output, new):
+    img.format = "jpeg" if new == "jpg" else new
+    img.save(filename=output)
+    return describe(img)
@@ -0,0 +1,156 @@
+import os
+import signal
+import subprocess
+import threading
+import time
+
+
+# settings
+TIMEOUT = int(os.environ.get("JOB_TIMEOUT", 3600))     # seconds a job may run before it is stopped
+GRACE = 5                                              # seconds between SIGTERM and SIGKILL
+
+local = threading.local()
+lock = threading.Lock()
+JOBS = {}       # owner -> set of Job
+
+
+# raised inside a job once it was cancelled, unwinds it to the scheduler
+# not an Exception so the "except Exception" fallbacks of the converters don't swallow it
+class Cancelled(BaseException):
+    pass
+
+
+# a queued or running job of one user, owns the processes it started
+class Job:
+
+    def __init__(self, owner):
+        self.owner = owner
+        self.procs = set()
+        self.reason = None      # "cancel" or "timeout" once stopped
+        self.results = []       # execute.Result of every command it ran
+        self.lock = threading.Lock()
+
+    def stop(self, reason):
+        with self.lock:
+            if self.reason is not None:
+                return
+            self.reason = reason
+            procs = list(self.procs)
+        for proc in procs:
+            kill(proc)
+
+    def stopped(self):
+        return self.reason is not None
+
+    def adopt(self, proc):
+        with self.lock:
+            self.procs.add(proc)
+            stopped = self.reason is not None
+        if stopped:
+            kill(proc)
+
+    def release(self, proc):
+        with self.lock:
+            self.procs.discard(proc)
+
+
+# terminate the whole process group, then kill whatever is left of it
+# never waits on proc, the thread running it reaps it (and sets returncode)
+# until then the group id can't be reused, after that it is left alone
+def kill(proc):
+    def stop():
+        if proc.returncode is not None:
+            return
+        try:
+            os.killpg(proc.pid, signal.SIGTERM)
+        except OSError:
+            return
+        time.sleep(GRACE)
+        if proc.returncode is not None:
+            return
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except OSError:
+            pass
+    threading.Thread(target=stop, daemon=True).start()
+
+
+# register a job when it is queued, so it can be cancelled before it starts
+def new(owner):
+    job = Job(owner)
+    with lock:
+        JOBS.setdefault(owner, set()).add(job)
+    return job
+
+
+# run target as job on this thread, returns the reason it was stopped or None
+def run(job, target, timeout=TIMEOUT):
+    timer = threading.Timer(timeout, job.stop, args=["timeout"])
+    timer.daemon = True
+    local.job = job
+    try:
+        if not job.stopped():
+            timer.start()
+            target()
+    except Cancelled:
+        pass
+    finally:
+        timer.cancel()
+        local.job = None
+        forget(job)
+    return job.reason
+
+
+# job that will never run
+def forget(job):
+    with lock:
+        jobs = JOBS.get(job.owner)
+        if jobs is not None:
+            jobs.discard(job)
+            if not jobs:
+                del JOBS[job.owner]
+
+
+# stop every job of owner, returns how many there were
+def cancel(owner):
+    with lock:
+        jobs = list(JOBS.get(owner, ()))
+    for job in jobs:
+        job.stop("cancel")
+    return len(jobs)
+
+
+def current():
+    return getattr(local, "job", None)
+
+
+def cancelled(job=None):
+    job = job or current()
+    return job is not None and job.stopped()
+
+
+def check(job=None):
+    if cancelled(job):
+        raise Cancelled()
+
+
+# subprocess.Popen in its own process group, killed with the job
+def popen(cmd, job=None, **kwargs):
+    job = job or current()
+    check(job)
+    proc = subprocess.Popen(cmd, start_new_session=True, **kwargs)
+    if job is not None:
+        job.adopt(proc)
+    return proc
+
+
+# wait for a process started with popen, raises Cancelled if the job was stopped meanwhile
+def wait(proc, job=None):
+    job = job or current()
+    try:
+        proc.wait()
+    finally:
+        if job is not None:
+            job.release(proc)
+    check(job)
+    return proc.returncode
@@ -6,7 +6,6 @@ from pyrogram.types import InlineKeyboardMarkup,InlineKeyboardButton
 
 import os
 import shutil
-import subprocess
 import threading
 import time
 
@@ -18,6 +17,24 @@ import guess
 import progconv
 import others
 import tictactoe
+import scheduler
+import progress
+import convcache
+import singleflight
+import prefetch
+import ffstream
+import ffplan
+import telegraphpub
+import imageengine
+import officepool
+import tabular
+import ebookconv
+import fontconv
+import workspace
+import jobctl
+import execute
+import stt
+import colorvideo
 
 
 # env
@@ -29,10 +46,19 @@ api_id = os.environ.get("ID", "25515908")
 # bot
 app = Client("my_bot",api_id=api_id, api_hash=api_hash,bot_token=bot_token)
 MESGS = {}
+progress.setup(lambda chat_id, msg_id, text: app.edit_message_text(chat_id, msg_id, text))
+
+
+# progress entry of a message, ids are only unique within a chat
+def progresskey(message, kind):
+    return f"{message.chat.id}-{message.id}{kind}"
 
 
 # msgs functions
 def saveMsg(msg, msg_type):
+    old = MESGS.get(msg.from_user.id)
+    if old is not None and old[0].id != msg.id:
+        prefetch.cancel(prefetchkey(old[0]))
     MESGS[msg.from_user.id] = [msg, msg_type]
 
 def getSavedMsg(msg):
@@ -42,9 +68,196 @@ def removeSavedMsg(msg):
     del MESGS[msg.from_user.id]
 
 
+# prefetch functions
+def prefetchkey(message):
+    return f"{message.chat.id}-{message.id}"
+
+# start downloading a received file before the user chooses what to do with it
+def prefetchmedia(message):
+    key = prefetchkey(message)
+    if not prefetch.begin(key, helperfunctions.filesize(message)):
+        return
+    if scheduler.submit(scheduler.NET, lambda: runprefetch(message, key)) is None:
+        prefetch.finish(key, None)
+
+def runprefetch(message, key):
+    try:
+        file = app.download_media(message, file_name=prefetch.folder(key), progress=prefetchprogress, progress_args=[message, key])
+    except Exception as e:
+        print(f"prefetch failed : {e}")
+        file = None
+    prefetch.finish(key, file)
+
+def prefetchprogress(current, total, message, key):
+    if prefetch.cancelled(key):
+        app.stop_transmission()
+    progress.update(progresskey(message, 'down'), current, total)
+
+# the prefetched file, moved into the job's workspace
+def takeprefetch(message):
+    try:
+        file = prefetch.take(prefetchkey(message), jobctl.current())
+    except jobctl.Cancelled:
+        # nobody else will take it once the choice was made, stop the download too
+        prefetch.cancel(prefetchkey(message))
+        raise
+    if file is not None:
+        file = workspace.adopt(file)
+    return file
+
+# prefetched file or download it now
+def fetch(message):
+    file = takeprefetch(message)
+    if file is None:
+        file = app.download_media(message, file_name=workspace.downloads(), progress=stopprogress, progress_args=[jobctl.current()])
+        jobctl.check()
+    return file
+
+
+# who a job belongs to, /cancel stops all of them
+def owner(message):
+    return message.from_user.id if message.from_user else message.chat.id
+
+
+# queue a job on the scheduler, tells the user if it has to wait or the bot is full
+# every job runs in its own workspace directory and can be stopped with /cancel or the job timeout
+# finished() is called once the job is over however it ended, also when it never ran (cancelled while queued, queue full)
+def enqueue(category, target, message, finished=None):
+    def queued(pos):
+        qmsg = app.send_message(message.chat.id, f"__Queued at Position **{pos}**, your job will start soon__", reply_to_message_id=message.id)
+        return lambda: app.delete_messages(message.chat.id, message_ids=qmsg.id)
+
+    control = jobctl.new(owner(message))
+    def runjob():
+        try:
+            reason = jobctl.run(control, lambda: workspace.run(target, helperfunctions.filesize(message)))
+        finally:
+            if finished is not None:
+                finished()
+        if control.results:
+            print(f"job of {control.owner} ({reason or 'done'}):\n{execute.report(control)}")
+        if reason == "timeout":
+            app.send_message(message.chat.id, "__Your job took too long and was **Stopped**__", reply_to_message_id=message.id)
+
+    job = scheduler.submit(category, runjob, onqueued=queued)
+    if job is None:
+        jobctl.forget(control)
+        if finished is not None:
+            finished()
+        app.send_message(message.chat.id, "__Bot is Busy right now, try again in a few minutes__", reply_to_message_id=message.id)
+    return job
+
+
+# workload class of a conversion
+def followcategory(inputt, new):
+    output = helperfunctions.updtname(inputt, new)
+    if tabular.handles(inputt, new):
+        return scheduler.CPU
+    if (output.upper().endswith(EB) and inputt.upper().endswith(EB)) or \
+       (output.upper().endswith(LBW) and inputt.upper().endswith(LBW)) or \
+       (output.upper().endswith(LBI) and inputt.upper().endswith(LBI)) or \
+       (output.upper().endswith(LBC) and inputt.upper().endswith(LBC)):
+        return scheduler.OFFICE
+    return scheduler.CPU
+
+
+# send an already converted file again, True if it was sent
+def sendcached(message, key):
+    entry = convcache.get(key)
+    if entry is None:
+        return False
+
+    file_id, caption = entry
+    try:
+        app.send_document(message.chat.id, document=file_id, force_document=True, caption=caption, reply_to_message_id=message.id)
+        return True
+    except Exception as e:
+        print(f"cached file_id failed : {e}")
+
+    path = convcache.localpath(key)
+    convcache.drop(key)
+    if path is None:
+        return False
+    sent = app.send_document(message.chat.id, document=path, force_document=True, caption=caption, reply_to_message_id=message.id)
+    remember(key, sent, path, caption)
+    return True
+
+
+# remember the converted file for the next same request
+def remember(key, sent, output, caption=""):
+    if key is None or sent is None or sent.document is None:
+        return
+    convcache.put(key, sent.document.file_id, caption)
+    convcache.store(key, output)
+
+
+# telegraph info page key
+def pagekey(kind, key):
+    if key is None:
+        return None
+    return f"{kind}|{key}"
+
+
+# info page to publish, or its url if it was already published
+def infoitem(key, build, *args):
+    url = telegraphpub.cached(key)
+    if url is not None:
+        return url
+    return (key, *build(*args))
+
+
+# info pages are published in the background and added to the caption when ready
+def publishinfo(sent, key, items):
+    if sent is None:
+        return
+
+    def done(urls):
+        caption = f'**Source File** : __{urls[0]}__\n\n**Converted File** : __{urls[1]}__'
+        app.edit_message_caption(sent.chat.id, sent.id, caption)
+        if key is not None and sent.document is not None:
+            convcache.put(key, sent.document.file_id, caption)
+
+    telegraphpub.publish(items, done)
+
+
+# cache and single flight key of a conversion
+def followkey(message, new):
+    if new == "ocr":
+        return None
+    return convcache.key(helperfunctions.uniqueid(message), new)
+
+
+# run follow, then hand the result to everyone who asked for the same conversion meanwhile
+# the same conversion finished for someone else (or is cached), send its result or convert it ourselves
+def followed(message,inputt,new,old,oldmessage):
+    if sendcached(message, followkey(message,new)):
+        app.delete_messages(message.chat.id,message_ids=oldmessage.id)
+    else:
+        startfollow(message,inputt,new,old,oldmessage)
+
+
+# start a conversion, joining an identical one if it is already running
+# a cached result is only sent again, from the LIGHT pool without waiting behind conversions
+def startfollow(message,inputt,new,old,oldmessage):
+    key = followkey(message,new)
+    if convcache.get(key) is not None:
+        enqueue(scheduler.LIGHT, lambda: followed(message, inputt, new, old, oldmessage), message)
+        return
+    if key is not None and not singleflight.join(key, lambda: enqueue(scheduler.LIGHT, lambda: followed(message, inputt, new, old, oldmessage), message)):
+        return
+
+    enqueue(followcategory(inputt, new), lambda: follow(message, inputt, new, old, oldmessage), message,
+            finished=None if key is None else lambda: singleflight.done(key))
+
+
 # main function to follow
 def follow(message,inputt,new,old,oldmessage):
-    output = helperfunctions.updtname(inputt,new)
+    output = workspace.output(helperfunctions.updtname(inputt,new))
+    ckey = followkey(message,new)
+
+    if sendcached(message, ckey):
+        app.delete_messages(message.chat.id,message_ids=oldmessage.id)
+        return
 
 
     # ffmpeg videos audios
@@ -52,21 +265,33 @@ def follow(message,inputt,new,old,oldmessage):
 
         print("It is VID/AUD option")
 
-        file,msg = down(message)
-        srclink = helperfunctions.videoinfo(file)
-        cmd = helperfunctions.ffmpegcommand(file,output,new)
+        if ffstream.streamable(inputt) and not ffplan.maycopy(inputt,new) and not prefetch.active(prefetchkey(message)):
+            # a running prefetch is waited for by down() instead of downloading the file twice
+            print("Streaming it into ffmpeg")
+            msg = streamconvert(message,inputt,output,new)
+            srcitem = "Streamed, not Available"
 
-        if msg != None:
-            app.edit_message_text(message.chat.id, msg.id, '__Converting__')
+        else:
+            file,msg = down(message)
+            uid = helperfunctions.uniqueid(message)
+            srcitem = infoitem(pagekey("src", uid), helperfunctions.videopage, file, uid)
 
-        os.system(cmd)
-        os.remove(file)
-        conlink = helperfunctions.videoinfo(output)
+            if msg != None:
+                app.edit_message_text(message.chat.id, msg.id, '__Converting__')
+
+            progress.track(progresskey(message, 'conv'), msg, "Converting")
+            try:
+                ffplan.convert(file,output,new,uid=uid,status=progresskey(message, 'conv'))
+            finally:
+                progress.finish(progresskey(message, 'conv'))
+            os.remove(file)
 
         if os.path.exists(output) and os.path.getsize(output) > 0:
-            caption=f'**Source File** : __{srclink}__\n\n**Converted File** : __{conlink}__'
+            conitem = infoitem(pagekey("con", ckey), helperfunctions.videopage, output)
             app.send_chat_action(message.chat.id, enums.ChatAction.UPLOAD_DOCUMENT)
-            up(message,output,msg,capt=caption)
+            sent = up(message,output,msg)
+            remember(ckey, sent, output)
+            publishinfo(sent, ckey, [srcitem, conitem])
         else:
             app.send_message(message.chat.id,"__Error while Conversion__", reply_to_message_id=message.id)
             
@@ -78,15 +303,32 @@ def follow(message,inputt,new,old,oldmessage):
     elif output.upper().endswith(IMG) and inputt.upper().endswith(IMG):
 
         print("It is IMG option")
-        file = app.download_media(message)
-        srclink = helperfunctions.imageinfo(file)
-        cmd = helperfunctions.magickcommand(file,output,new)
-        os.system(cmd)
-        conlink = helperfunctions.imageinfo(output)
+        file = fetch(message)
+        srckey = pagekey("src", helperfunctions.uniqueid(message))
+        infos = None
+        if new == "ico":
+            done = imageengine.buildico(file,output)
+        else:
+            infos = imageengine.convert(file,output,new)
+            done = infos is not None
+
+        if infos is not None:
+            srcitem = infoitem(srckey, lambda: (helperfunctions.pagetitle(file), infos[0]))
+        else:
+            srcitem = infoitem(srckey, helperfunctions.imagepage, file)
+        if not done:
+            cmd = helperfunctions.magickcommand(file,output,new)
+            execute.run(cmd)
 
         if os.path.exists(output) and os.path.getsize(output) > 0:
+            if infos is not None:
+                conitem = infoitem(pagekey("con", ckey), lambda: (helperfunctions.pagetitle(output), infos[1]))
+            else:
+                conitem = infoitem(pagekey("con", ckey), helperfunctions.imagepage, output)
             app.send_chat_action(message.chat.id, enums.ChatAction.UPLOAD_DOCUMENT)
-            app.send_document(message.chat.id,document=output, force_document=True, caption=f'**Source File** : __{srclink}\n\n**Converted File** : __{conlink}__', reply_to_message_id=message.id)
+            sent = app.send_document(message.chat.id,document=output, force_document=True, reply_to_message_id=message.id)
+            remember(ckey, sent, output)
+            publishinfo(sent, ckey, [srcitem, conitem])
         else:
             app.send_message(message.chat.id,"__Error while Conversion__", reply_to_message_id=message.id)
 
@@ -94,19 +336,19 @@ def follow(message,inputt,new,old,oldmessage):
             os.remove(output) 
 
         if new == "ocr":
-            cmd = helperfunctions.tesrctcommand(file,message.id)
-            os.system(cmd)
-            with open(f"{message.id}.txt","r") as ocr:
+            cmd = helperfunctions.tesrctcommand(file,workspace.path(str(message.id)))
+            execute.run(cmd)
+            with open(workspace.path(f"{message.id}.txt"),"r") as ocr:
                 text = ocr.read()
-            os.remove(f"{message.id}.txt")
+            os.remove(workspace.path(f"{message.id}.txt"))
             if text != "":
                 app.send_message(message.chat.id, text, reply_to_message_id=message.id)
             
         if new == "ico":
-            slist = ["256", "128", "96", "64", "48", "32", "16"]
-            for ele in slist:
-                toutput = helperfunctions.updtname(inputt,f"{ele}.png")
-                os.remove(toutput)
+            for ele in imageengine.ICOSIZES:
+                toutput = helperfunctions.updtname(file,f"{ele}.png")
+                if os.path.exists(toutput):
+                    os.remove(toutput)
         
         os.remove(file)
 
@@ -117,16 +359,18 @@ def follow(message,inputt,new,old,oldmessage):
         if new == "webp" or new == "gif" or new == "png":
 
             print("It is Animated Sticker option")
-            file = app.download_media(message)
-            srclink = helperfunctions.imageinfo(file)        
-            os.system(f'./tgsconverter "{file}" "{new}"')
+            file = fetch(message)
+            srcitem = infoitem(pagekey("src", helperfunctions.uniqueid(message)), helperfunctions.imagepage, file)
+            execute.run(["./tgsconverter", file, new])
             os.remove(file)
             output = helperfunctions.updtname(file,new)
-            conlink = helperfunctions.imageinfo(output)
 
             if os.path.exists(output) and os.path.getsize(output) > 0:
+                conitem = infoitem(pagekey("con", ckey), helperfunctions.imagepage, output)
                 app.send_chat_action(message.chat.id, enums.ChatAction.UPLOAD_DOCUMENT)
-                app.send_document(message.chat.id,document=output, force_document=True, caption=f'**Source File** : __{srclink}\n\n**Converted File** : __{conlink}__', reply_to_message_id=message.id)
+                sent = app.send_document(message.chat.id,document=output, force_document=True, reply_to_message_id=message.id)
+                remember(ckey, sent, output)
+                publishinfo(sent, ckey, [srcitem, conitem])
             else:
                 app.send_message(message.chat.id,"__Error while Conversion__", reply_to_message_id=message.id)
 
@@ -141,14 +385,14 @@ def follow(message,inputt,new,old,oldmessage):
     elif output.upper().endswith(EB) and inputt.upper().endswith(EB):
 
         print("It is Ebook option")
-        file = app.download_media(message)
-        cmd = helperfunctions.calibrecommand(file,output)
-        os.system(cmd)
+        file = fetch(message)
+        ebookconv.convert(file,output)
         os.remove(file)
 
         if os.path.exists(output) and os.path.getsize(output) > 0:
             app.send_chat_action(message.chat.id, enums.ChatAction.UPLOAD_DOCUMENT)
-            app.send_document(message.chat.id, document=output, force_document=True, reply_to_message_id=message.id)
+            sent = app.send_document(message.chat.id,document=output, force_document=True, reply_to_message_id=message.id)
+            remember(ckey, sent, output)
         else:
             app.send_message(message.chat.id,"__Error while Conversion__", reply_to_message_id=message.id)
             
@@ -160,15 +404,15 @@ def follow(message,inputt,new,old,oldmessage):
     elif (output.upper().endswith(LBW) and inputt.upper().endswith(LBW)) or (output.upper().endswith(LBI) and inputt.upper().endswith(LBI)) or (output.upper().endswith(LBC) and inputt.upper().endswith(LBC)):
         
         print("It is LibreOffice option")
-        file = app.download_media(message)
-        cmd = helperfunctions.libreofficecommand(file,new)
-        # os.system(cmd)
-        subprocess.run([cmd],env={"HOME": "."},)
+        file = fetch(message)
+        if not tabular.convert(file,output,new):
+            officepool.convert(file,output,new)
         os.remove(file)
 
         if os.path.exists(output) and os.path.getsize(output) > 0:
             app.send_chat_action(message.chat.id, enums.ChatAction.UPLOAD_DOCUMENT)
-            app.send_document(message.chat.id,document=output, force_document=True, reply_to_message_id=message.id)
+            sent = app.send_document(message.chat.id,document=output, force_document=True, reply_to_message_id=message.id)
+            remember(ckey, sent, output)
         else:
             app.send_message(message.chat.id,"__Error while Conversion__", reply_to_message_id=message.id)
         
@@ -180,15 +424,14 @@ def follow(message,inputt,new,old,oldmessage):
     elif output.upper().endswith(FF) and inputt.upper().endswith(FF):
         
         print("It is FontForge option")
-        file = app.download_media(message)
-        cmd = helperfunctions.fontforgecommand(file,output,message)
-        os.system(cmd)
-        os.remove(f"{message.id}-convert.pe")
+        file = fetch(message)
+        fontconv.convert(file,[output])
         os.remove(file)
 
         if os.path.exists(output) and os.path.getsize(output) > 0:
             app.send_chat_action(message.chat.id, enums.ChatAction.UPLOAD_DOCUMENT)
-            app.send_document(message.chat.id,document=output, force_document=True, reply_to_message_id=message.id)
+            sent = app.send_document(message.chat.id,document=output, force_document=True, reply_to_message_id=message.id)
+            remember(ckey, sent, output)
         else:
             app.send_message(message.chat.id,"__Error while Conversion__", reply_to_message_id=message.id)
             
@@ -204,14 +447,15 @@ def follow(message,inputt,new,old,oldmessage):
 
         else:
             print("It is Subtitles option")
-            file = app.download_media(message)
+            file = fetch(message)
             cmd = helperfunctions.subtitlescommand(file,output)
-            os.system(cmd)
+            execute.run(cmd)
             os.remove(file)
 
             if os.path.exists(output) and os.path.getsize(output) > 0:
                 app.send_chat_action(message.chat.id, enums.ChatAction.UPLOAD_DOCUMENT)
-                app.send_document(message.chat.id,document=output, force_document=True, reply_to_message_id=message.id)
+                sent = app.send_document(message.chat.id,document=output, force_document=True, reply_to_message_id=message.id)
+                remember(ckey, sent, output)
             else:
                 app.send_message(message.chat.id,"__Error while Conversion__", reply_to_message_id=message.id)
                 
@@ -244,7 +488,7 @@ def follow(message,inputt,new,old,oldmessage):
 
         else:
             print("It is Programs option")
-            file = app.download_media(message)
+            file = fetch(message)
 
             if flag == 1:
                 output = progconv.c2Go(file)
@@ -266,7 +510,8 @@ def follow(message,inputt,new,old,oldmessage):
 
             if os.path.exists(output) and os.path.getsize(output) > 0:
                 app.send_chat_action(message.chat.id, enums.ChatAction.UPLOAD_DOCUMENT)
-                app.send_document(message.chat.id,document=output, force_document=True, reply_to_message_id=message.id)
+                sent = app.send_document(message.chat.id,document=output, force_document=True, reply_to_message_id=message.id)
+                remember(ckey, sent, output)
             else:
                 if flag != 3:
                     errormessage = "Error while Conversion"
@@ -284,14 +529,15 @@ def follow(message,inputt,new,old,oldmessage):
 
         else:
             print("It is 3D files option")
-            file = app.download_media(message)
+            file = fetch(message)
             cmd = helperfunctions.ctm3dcommand(file,output)
-            os.system(cmd)
+            execute.run(cmd)
             os.remove(file)
 
             if os.path.exists(output) and os.path.getsize(output) > 0:
                 app.send_chat_action(message.chat.id, enums.ChatAction.UPLOAD_DOCUMENT)
-                app.send_document(message.chat.id,document=output, force_document=True, reply_to_message_id=message.id)
+                sent = app.send_document(message.chat.id,document=output, force_document=True, reply_to_message_id=message.id)
+                remember(ckey, sent, output)
             else:
                 app.send_message(message.chat.id,"__Error while Conversion__", reply_to_message_id=message.id)
                 
@@ -310,29 +556,29 @@ def follow(message,inputt,new,old,oldmessage):
 
 # negative to positive
 def negetivetopostive(message,oldmessage):
-    file = app.download_media(message)
-    output = file.split("/")[-1]
+    file = fetch(message)
+    output = workspace.output(file.split("/")[-1])
 
     try:
         print("using c41lab")
-        os.system(f'./c41lab.py "{file}" "{output}"')
+        execute.run(["./c41lab.py", file, output])
         app.send_document(message.chat.id,document=output, force_document=True,caption="used tool -> **c41lab**", reply_to_message_id=message.id)
         os.remove(output)
-    except: pass
+    except Exception: pass
 
     try: 
         print("using simple tool")
         aifunctions.positiver(file,output)
         app.send_document(message.chat.id,document=output, force_document=True,caption="used tool -> **openCV**", reply_to_message_id=message.id)
         os.remove(output)
-    except: pass
+    except Exception: pass
     
     try:
         print("using negfix8")
-        os.system(f'./negfix8 "{file}" "{output}"')
+        execute.run(["./negfix8", file, output])
         app.send_document(message.chat.id,document=output, force_document=True,caption="used tool -> **negfix8**", reply_to_message_id=message.id)
         os.remove(output)
-    except: pass
+    except Exception: pass
 
     os.remove(file)
     app.delete_messages(message.chat.id,message_ids=oldmessage.id)
@@ -340,25 +586,52 @@ def negetivetopostive(message,oldmessage):
 
 # color image
 def colorizeimage(message,oldmessage):
-    file = app.download_media(message)
-    output = file.split("/")[-1]
+    file = fetch(message)
+    output = workspace.output(file.split("/")[-1])
 
     try:
         aifunctions.deoldify(file,output)
         app.send_document(message.chat.id,document=output, force_document=True,caption="used tool -> **Deoldify**", reply_to_message_id=message.id)
         os.remove(output)
-    except: pass
+    except Exception: pass
 
     try:
         aifunctions.colorize_image(output,file)
         app.send_document(message.chat.id,document=output, force_document=True,caption="used tool -> **Local Model**", reply_to_message_id=message.id)
         os.remove(output)
-    except: pass
+    except Exception: pass
 
     os.remove(file)
     app.delete_messages(message.chat.id,message_ids=oldmessage.id)
 
 
+# color black & white video
+def colorizevideo(message,oldmessage):
+    file,msg = down(message)
+    output = workspace.output(file.split("/")[-1])
+
+    progress.track(progresskey(message, 'color'), oldmessage, "Colorizing")
+    try:
+        done = colorvideo.convert(file,output,status=progresskey(message, 'color'))
+    except Exception as e:
+        print(f"colorvideo : {e}")
+        done = False
+    finally:
+        progress.finish(progresskey(message, 'color'))
+
+    if done:
+        up(message,output,msg,capt="used tool -> **Local Model**")
+    else:
+        app.send_message(message.chat.id,"__Error while Colorizing__", reply_to_message_id=message.id)
+        if msg != None:
+            app.delete_messages(message.chat.id,message_ids=msg.id)
+
+    if os.path.exists(output):
+        os.remove(output)
+    os.remove(file)
+    app.delete_messages(message.chat.id,message_ids=oldmessage.id)
+
+
 # dalle
 def genrateimages(message,prompt,msg):
     
@@ -368,7 +641,7 @@ def genrateimages(message,prompt,msg):
     for ele in filelist:
         app.send_document(message.chat.id,document=ele,force_document=True)
         os.remove(ele)
-    os.rmdir(prompt)
+    os.rmdir(workspace.path(prompt))
 
     # satbility ai
     filelist = aifunctions.stabilityAI(prompt)
@@ -411,7 +684,7 @@ def dltmsg(umsg,rmsg,sec=15):
 
 # read file
 def readf(message,oldmessage):
-    file = app.download_media(message)
+    file = fetch(message)
     
     try:
         with open(file,"r", encoding="utf-8") as rf:
@@ -436,7 +709,7 @@ def readf(message,oldmessage):
 # send video
 def sendvideo(message,oldmessage):
     file, msg = down(message)
-    thumb,duration,width,height = mediainfo.allinfo(file)
+    thumb,duration,width,height = mediainfo.allinfo(file,uid=helperfunctions.uniqueid(message))
     up(message, file, msg, video=True, capt=f'**{file.split("/")[-1]}**' ,thumb=thumb, duration=duration, height=height, widht=width)
 
     app.delete_messages(message.chat.id, message_ids=oldmessage.id)
@@ -454,7 +727,7 @@ def senddoc(message,oldmessage):
 
 # send photo
 def sendphoto(message,oldmessage):
-    file = app.download_media(message)
+    file = fetch(message)
     app.send_photo(message.chat.id, photo=file, reply_to_message_id=message.id)
     app.delete_messages(message.chat.id,message_ids=oldmessage.id)
     os.remove(file)
@@ -463,16 +736,13 @@ def sendphoto(message,oldmessage):
 # extract file
 def extract(message,oldm):
     file, msg = down(message)
-    cmd,foldername,infofile = helperfunctions.zipcommand(file,message)
+    cmd,foldername = helperfunctions.zipcommand(file,message)
     if msg != None:
         app.edit_message_text(message.chat.id, msg.id, '__Extracting__')
-    os.system(cmd)
+    lines = execute.run(cmd, capture=True).stdout.decode(errors="ignore")
     os.remove(file)
 
-    with open(infofile, 'r') as f:
-        lines = f.read()
     last = lines.split("Everything is Ok\n\n")[-1].replace("      ","")
-    os.remove(infofile)
 
     if os.path.exists(foldername):
         dir_list = helperfunctions.absoluteFilePaths(foldername)
@@ -506,12 +776,12 @@ def compile(message,oldm):
 
     # jar compilation
     if ext.upper() == "JAR":
-        file = app.download_media(message)
+        file = fetch(message)
         cmd,folder,files = helperfunctions.warpcommand(file,message)
-        os.system(cmd)
+        execute.run(cmd, memory=None)
         if not os.path.exists(folder):
             cmd,folder,files = helperfunctions.warpcommand(file,message,True)
-            os.system(cmd)
+            execute.run(cmd, memory=None)
 
         os.remove(file)
         if os.path.exists(folder):
@@ -527,9 +797,9 @@ def compile(message,oldm):
 
     # c and c++ compilation
     elif ext.upper() in ['C','CPP']:
-        file = app.download_media(message)
+        file = fetch(message)
         cmd,output = helperfunctions.gppcommand(file)
-        os.system(cmd)
+        execute.run(cmd)
         os.remove(file)
         if os.path.exists(output) and os.path.getsize(output) > 0:
             app.send_document(message.chat.id,document=output, caption="__Linux Executable__", force_document=True, reply_to_message_id=message.id)
@@ -540,9 +810,9 @@ def compile(message,oldm):
 
     # python compile
     elif ext.upper() == "PY":
-        file = app.download_media(message)
+        file = fetch(message)
         cmd, output, ofold, tfold, temp = helperfunctions.pyinstallcommand(message,file)
-        os.system(cmd)
+        execute.run(cmd)
         os.remove(file)
         if os.path.exists(output) and os.path.getsize(output) > 0:
             app.send_document(message.chat.id,document=output, caption="__Linux Executable__", force_document=True, reply_to_message_id=message.id)
@@ -573,7 +843,7 @@ def runpro(message,oldm):
 
     # python run
     if ext.upper() == "PY":
-        file = app.download_media(message)
+        file = fetch(message)
         code = open(file,"r",encoding="utf-8").read()
         os.remove(file)
         info = others.pyrun(code)
@@ -588,7 +858,7 @@ def runpro(message,oldm):
 
 # bg remove
 def bgremove(message,oldm):
-    file = app.download_media(message)
+    file = fetch(message)
     ofile = aifunctions.bg_remove(file)
     os.remove(file)
     app.send_document(message.chat.id, ofile, reply_to_message_id=message.id)
@@ -598,7 +868,7 @@ def bgremove(message,oldm):
 
 # scanning
 def scan(message,oldm):
-    file = app.download_media(message)
+    file = fetch(message)
     info = helperfunctions.scanner(file)
     app.send_message(message.chat.id,f"__{info}__", reply_to_message_id=message.id)
     app.delete_messages(message.chat.id,message_ids=oldm.id)
@@ -613,7 +883,7 @@ def makefile(message,mtext,oldmessage):
         return
 
     firstline = text[0]
-    firstline = "".join( x for x in firstline if (x.isalnum() or x in "._-@ "))
+    firstline = workspace.output("".join( x for x in firstline if (x.isalnum() or x in "._-@ ")))
     text.remove(text[0])
     
     mtext = ""
@@ -634,29 +904,15 @@ def makefile(message,mtext,oldmessage):
 
 # transcript speech to text
 def transcript(message,oldmessage):
-    file = app.download_media(message)
+    file = fetch(message)
     inputt = file.split("/")[-1]
-    output = helperfunctions.updtname(inputt,"wav")
-    temp = helperfunctions.updtname(inputt,"txt")
-        
-    if file.endswith("wav"):
-        aifunctions.splitfn(file,message,temp)
-    else:
-        cmd = helperfunctions.ffmpegcommand(file,output,"wav")
-        os.system(cmd)
-        aifunctions.splitfn(output,message,temp)
-        os.remove(output)
+    temp = workspace.output(helperfunctions.updtname(inputt,"txt"))
 
-    if os.path.getsize(temp) > 0:
-        app.send_document(message.chat.id, document=temp,caption="**Google Engine**", reply_to_message_id=message.id)
-    os.remove(temp)
-
-    data = aifunctions.whisper(file)
-    if data is not None:
+    # backends and how they are combined are set by STT_BACKENDS / STT_POLICY
+    for backend, data in stt.transcribe(file):
         with open(temp,"w") as wfile:
             wfile.write(data)
-        if os.path.getsize(temp) > 0:
-            app.send_document(message.chat.id, document=temp,caption="**OpenAI Engine** __(whisper)__", reply_to_message_id=message.id)
+        app.send_document(message.chat.id, document=temp,caption=backend.caption, reply_to_message_id=message.id)
         os.remove(temp)
 
     app.delete_messages(message.chat.id,message_ids=oldmessage.id)
@@ -673,9 +929,9 @@ def textTo3d(prompt,message,msg):
 
 # text to speech 
 def speak(message,oldmessage):
-    file = app.download_media(message)
+    file = fetch(message)
     inputt = file.split("/")[-1]
-    output = helperfunctions.updtname(inputt,"mp3")
+    output = workspace.output(helperfunctions.updtname(inputt,"mp3"))
    
     aifunctions.texttospeech(file,output)
     os.remove(file)
@@ -687,8 +943,8 @@ def speak(message,oldmessage):
 
 # upscaling
 def increaseres(message,oldmessage):
-    file = app.download_media(message)
-    inputt = file.split("/")[-1]
+    file = fetch(message)
+    inputt = workspace.output(file.split("/")[-1])
    
     try:
         aifunctions.upscale(file,inputt)
@@ -705,6 +961,7 @@ def increaseres(message,oldmessage):
 def rname(message,newname,oldm):
     app.delete_messages(message.chat.id,message_ids=message.id+1)
     file, msg = down(message)
+    newname = workspace.output(newname)
     os.rename(file,newname)
     up(message, newname, msg)
     app.delete_messages(message.chat.id,message_ids=oldm.id)
@@ -789,16 +1046,44 @@ def down(message):
 
     if size > 25000000:
         msg = app.send_message(message.chat.id, '__Downloading__', reply_to_message_id=message.id)
-        dosta = threading.Thread(target=lambda:downstatus(f'{message.id}downstatus.txt',msg),daemon=True)
-        dosta.start()
     else:
         msg = None
 
-    file = app.download_media(message,progress=dprogress, progress_args=[message])
-    os.remove(f'{message.id}downstatus.txt')
+    progress.track(progresskey(message, 'down'), msg, "Downloaded")
+    try:
+        file = takeprefetch(message)
+        if file is None:
+            file = app.download_media(message, file_name=workspace.downloads(), progress=dprogress, progress_args=[message, jobctl.current()])
+    finally:
+        progress.finish(progresskey(message, 'down'))
+    jobctl.check()
     return file,msg
 
 
+# download straight into ffmpeg, converting while downloading
+def streamconvert(message,inputt,output,new):
+    size = helperfunctions.filesize(message) or 0
+    if size > 25000000:
+        msg = app.send_message(message.chat.id, '__Downloading & Converting__', reply_to_message_id=message.id)
+    else:
+        msg = None
+
+    def chunks():
+        current = 0
+        for chunk in app.stream_media(message):
+            jobctl.check()
+            current += len(chunk)
+            progress.update(progresskey(message, 'down'), current, size)
+            yield chunk
+
+    progress.track(progresskey(message, 'down'), msg, "Downloaded & Converted")
+    try:
+        ffstream.transcode(chunks(), output)
+    finally:
+        progress.finish(progresskey(message, 'down'))
+    return msg
+
+
 # uploading with progress
 def up(message, file, msg, video=False, capt="", thumb=None, duration=0, widht=0, height=0, multi=False):
 
@@ -809,83 +1094,44 @@ def up(message, file, msg, video=False, capt="", thumb=None, duration=0, widht=0
             pass
         
     if os.path.getsize(file) > 25000000:
-        upsta = threading.Thread(target=lambda:upstatus(f'{message.id}upstatus.txt',msg),daemon=True)
-        upsta.start()
-
-    if not video:
-        app.send_document(message.chat.id, document=file, caption=capt, force_document=True ,reply_to_message_id=message.id, progress=uprogress, progress_args=[message])    
+        progress.track(progresskey(message, 'up'), msg, "Uploaded")
     else:
-        app.send_video(message.chat.id, video=file, caption=capt, thumb=thumb, duration=duration, width=widht, height=height, reply_to_message_id=message.id, progress=uprogress, progress_args=[message]) 
+        progress.track(progresskey(message, 'up'), None, "Uploaded")
+
+    try:
+        if not video:
+            sent = app.send_document(message.chat.id, document=file, caption=capt, force_document=True ,reply_to_message_id=message.id, progress=uprogress, progress_args=[message, jobctl.current()])    
+        else:
+            sent = app.send_video(message.chat.id, video=file, caption=capt, thumb=thumb, duration=duration, width=widht, height=height, reply_to_message_id=message.id, progress=uprogress, progress_args=[message, jobctl.current()]) 
+    finally:
+        progress.finish(progresskey(message, 'up'))
+    jobctl.check()
 
     if thumb != None:
         os.remove(thumb)
-    if os.path.exists(f'{message.id}upstatus.txt'):   
-        os.remove(f'{message.id}upstatus.txt')
 
     if msg != None and not multi:
         app.delete_messages(message.chat.id,message_ids=msg.id)
 
+    return sent
+
 
 # up progress
-def uprogress(current, total, message):
-    with open(f'{message.id}upstatus.txt',"w") as fileup:
-        fileup.write(f"{current * 100 / total:.1f}%")
+def uprogress(current, total, message, job):
+    stopprogress(current, total, job)
+    progress.update(progresskey(message, 'up'), current, total)
 
 
 # down progress
-def dprogress(current, total, message):
-    with open(f'{message.id}downstatus.txt',"w") as fileup:
-        fileup.write(f"{current * 100 / total:.1f}%")
-
-
-# upload status
-def upstatus(statusfile,message):
+def dprogress(current, total, message, job):
+    stopprogress(current, total, job)
+    progress.update(progresskey(message, 'down'), current, total)
 
-    while True:
-        if os.path.exists(statusfile):
-            break
-        
-    time.sleep(5)
-    while os.path.exists(statusfile):
-
-        with open(statusfile,"r") as upread:
-            txt = upread.read()
-
-        #if "%" not in txt:
-                #txt = "0.0%"
-
-        try:
-            app.edit_message_text(message.chat.id, message.id, f"__Uploaded__ : **{txt}**")
-            #if txt == "100.0%":
-                #break
-            time.sleep(10)
-        except:
-            time.sleep(5)
 
-
-# download status
-def downstatus(statusfile,message):
-
-    while True:
-        if os.path.exists(statusfile):
-            break
-        
-    time.sleep(5)
-    while os.path.exists(statusfile):
-
-        with open(statusfile,"r") as upread:
-            txt = upread.read()
-        
-        #if "%" not in txt:
-                #txt = "0.0%"
-
-        try:
-            app.edit_message_text(message.chat.id, message.id, f"__Downloaded__ : **{txt}**")
-            #if txt == "100.0%":
-                #break
-            time.sleep(10)
-        except:
-            time.sleep(5)
+# aborts a transfer of a cancelled job, progress callbacks don't run on the job's thread
+def stopprogress(current, total, job):
+    if jobctl.cancelled(job):
+        app.stop_transmission()
 
 
 # app messages
@@ -931,8 +1177,7 @@ def rename(client: pyrogram.client.Client, message: pyrogram.types.messages_and_
     nmessage, msg_type = getSavedMsg(message)
     if nmessage:
         oldm = app.send_message(message.chat.id, "__**Renaming**__", reply_markup=ReplyKeyboardRemove(), reply_to_message_id=nmessage.id)
-        rn = threading.Thread(target=lambda:rname(nmessage,newname,oldm),daemon=True)
-        rn.start() 
+        enqueue(scheduler.NET, lambda: rname(nmessage,newname,oldm), nmessage)
         removeSavedMsg(message)
     else:
         app.send_message(message.chat.id, "__You need to send me a File first__", reply_to_message_id=message.id)   
@@ -942,10 +1187,14 @@ def rename(client: pyrogram.client.Client, message: pyrogram.types.messages_and_
 @app.on_message(filters.command(['cancel']))
 def cancel(client: pyrogram.client.Client, message: pyrogram.types.messages_and_media.message.Message):
     nmessage, msg_type = getSavedMsg(message)
+    stopped = jobctl.cancel(owner(message))
     if nmessage:
         removeSavedMsg(message)
+        prefetch.cancel(prefetchkey(nmessage))
         app.delete_messages(message.chat.id,message_ids=nmessage.id+1)
         app.send_message(message.chat.id,"__Your job was **Canceled**__",reply_markup=ReplyKeyboardRemove(), reply_to_message_id=message.id)
+    elif stopped:
+        app.send_message(message.chat.id,f"__Your running {'jobs were' if stopped > 1 else 'job was'} **Canceled**__", reply_to_message_id=message.id)
     else:
         app.send_message(message.chat.id,"__No job to Cancel__", reply_to_message_id=message.id)     
 
@@ -963,8 +1212,7 @@ def getpompt(client: pyrogram.client.Client, message: pyrogram.types.messages_an
 
 	# threding	
 	msg = app.send_message(message.chat.id,"__Prompt received and Request is sent. Waiting time is 1-2 mins__", reply_to_message_id=message.id)
-	ai = threading.Thread(target=lambda:genrateimages(message,prompt,msg),daemon=True)
-	ai.start()
+	enqueue(scheduler.NET, lambda: genrateimages(message,prompt,msg), message)
 
 
 # music gen
@@ -980,8 +1228,7 @@ def getpompt(client: pyrogram.client.Client, message: pyrogram.types.messages_an
 
 	# threding	
 	msg = app.send_message(message.chat.id,"__Prompt received and Request is sent. Waiting time is 1 minute__", reply_to_message_id=message.id)
-	mai = threading.Thread(target=lambda:genratemusic(message,prompt,msg),daemon=True)
-	mai.start()
+	enqueue(scheduler.NET, lambda: genratemusic(message,prompt,msg), message)
 
 
 # read command
@@ -995,8 +1242,7 @@ def readcmd(client: pyrogram.client.Client, message: pyrogram.types.messages_and
         return
 
     oldm = app.send_message(message.chat.id,'__Reading File__', reply_to_message_id=message.id)
-    rf = threading.Thread(target=lambda:readf(nmessage,oldm),daemon=True)
-    rf.start()
+    enqueue(scheduler.LIGHT, lambda: readf(nmessage,oldm), nmessage)
 
 
 # make command
@@ -1014,8 +1260,7 @@ def makecmd(client: pyrogram.client.Client, message: pyrogram.types.messages_and
             return 
 
     oldm = app.send_message(message.chat.id,'__Making File__', reply_to_message_id=message.id)
-    mf = threading.Thread(target=lambda:makefile(message,text,oldm),daemon=True)
-    mf.start()
+    enqueue(scheduler.LIGHT, lambda: makefile(message,text,oldm), message)
 
 
 # Point E
@@ -1027,8 +1272,7 @@ def send_gpt(client: pyrogram.client.Client,message: pyrogram.types.messages_and
         return	
 
     msg = message.reply_text("__3Dizing...__", reply_to_message_id=message.id)
-    pnte = threading.Thread(target=lambda:textTo3d(prompt,message,msg),daemon=True)
-    pnte.start()
+    enqueue(scheduler.NET, lambda: textTo3d(prompt,message,msg), message)
 
 
 # Tic Tac Toe Game
@@ -1076,8 +1320,7 @@ def bloomcmd(client: pyrogram.client.Client, message: pyrogram.types.messages_an
             return	
     
     msg = message.reply_text("__Blooming...__", reply_to_message_id=message.id)
-    blm = threading.Thread(target=lambda:handelbloom(para,message,msg),daemon=True)
-    blm.start()
+    enqueue(scheduler.NET, lambda: handelbloom(para,message,msg), message)
 
 
 # callback
@@ -1091,13 +1334,14 @@ def inbtwn(client: pyrogram.client.Client, call: pyrogram.types.CallbackQuery):
 @app.on_message(filters.document)
 def documnet(client: pyrogram.client.Client, message: pyrogram.types.messages_and_media.message.Message):
     saveMsg(message, "DOCUMENT")
+    prefetchmedia(message)
     dext = message.document.file_name.split(".")[-1].upper()
 
     # VID / AUD
     if message.document.file_name.upper().endswith(VIDAUD):
         app.send_message(message.chat.id,
                          f'__Detected Extension:__ **{dext}** 📹 / 🔊\n__Now send extension to Convert to...__\n\n--**Available formats**-- \n\n__{VA_TEXT}__\n\n{message.from_user.mention} __choose or click /cancel to Cancel or use /rename  to  Rename__',
-                         reply_markup=VAboard, reply_to_message_id=message.id)
+                         reply_markup=VAboard if message.document.file_name.upper().endswith(VID) else AUDboard, reply_to_message_id=message.id)
 
     # IMG
     elif message.document.file_name.upper().endswith(IMG):
@@ -1144,9 +1388,9 @@ def documnet(client: pyrogram.client.Client, message: pyrogram.types.messages_an
     # TOR
     elif message.document.file_name.upper().endswith("TORRENT"):
         removeSavedMsg(message)
+        prefetch.cancel(prefetchkey(message))
         oldm = app.send_message(message.chat.id,'__Getting Magnet Link__', reply_to_message_id=message.id)
-        ml = threading.Thread(target=lambda:getmag(message,oldm),daemon=True)
-        ml.start()
+        enqueue(scheduler.NET, lambda: getmag(message,oldm), message)
         return
     
     # SUB
@@ -1177,8 +1421,7 @@ def documnet(client: pyrogram.client.Client, message: pyrogram.types.messages_an
 @app.on_message(filters.animation)
 def annimations(client: pyrogram.client.Client, message: pyrogram.types.messages_and_media.message.Message):
     oldm = app.send_message(message.chat.id,'**Turning it into Document then you can use that to Convert**',reply_markup=ReplyKeyboardRemove(), reply_to_message_id=message.id)
-    sd = threading.Thread(target=lambda:senddoc(message,oldm),daemon=True)
-    sd.start()
+    enqueue(scheduler.NET, lambda: senddoc(message,oldm), message)
 
 
 # video
@@ -1188,6 +1431,7 @@ def video(client: pyrogram.client.Client, message: pyrogram.types.messages_and_m
     try:
         if message.video.file_name.upper().endswith(VIDAUD):
             saveMsg(message, "VIDEO")
+            prefetchmedia(message)
             dext = message.video.file_name.split(".")[-1].upper()
             app.send_message(message.chat.id,
                             f'__Detected Extension:__ **{dext}** 📹 / 🔊\n__Now send extension to Convert to...__\n\n--**Available formats**-- \n\n__{VA_TEXT}__\n\n{message.from_user.mention} __choose or click /cancel to Cancel or use /rename  to  Rename__',
@@ -1198,14 +1442,14 @@ def video(client: pyrogram.client.Client, message: pyrogram.types.messages_and_m
    
     except:
         oldm = app.send_message(message.chat.id,'**Turning it into Document then you can use that to Convert**',reply_markup=ReplyKeyboardRemove())
-        sd = threading.Thread(target=lambda:senddoc(message,oldm),daemon=True)
-        sd.start()
+        enqueue(scheduler.NET, lambda: senddoc(message,oldm), message)
 
 
 # video note
 @app.on_message(filters.video_note)
 def videonote(client: pyrogram.client.Client, message: pyrogram.types.messages_and_media.message.Message):
     saveMsg(message, "VIDEO_NOTE")
+    prefetchmedia(message)
     app.send_message(message.chat.id,
                 f'__Detected Extension:__ **MP4** 📹 / 🔊\n__Now send extension to Convert to...__\n\n--**Available formats**-- \n\n__{VA_TEXT}__\n\n{message.from_user.mention} __choose or click /cancel to Cancel or use /rename  to  Rename__',
                 reply_markup=VAboard, reply_to_message_id=message.id)
@@ -1216,10 +1460,11 @@ def videonote(client: pyrogram.client.Client, message: pyrogram.types.messages_a
 def audio(client: pyrogram.client.Client, message: pyrogram.types.messages_and_media.message.Message):
     if message.audio.file_name.upper().endswith(VIDAUD):
         saveMsg(message, "AUDIO")
+        prefetchmedia(message)
         dext = message.audio.file_name.split(".")[-1].upper()
         app.send_message(message.chat.id,
                          f'__Detected Extension:__ **{dext}** 📹 / 🔊\n__Now send extension to Convert to...__\n\n--**Available formats**-- \n\n__{VA_TEXT}__\n\n{message.from_user.mention} __choose or click /cancel to Cancel or use /rename  to  Rename__',
-                         reply_markup=VAboard, reply_to_message_id=message.id)
+                         reply_markup=AUDboard, reply_to_message_id=message.id)
     else:
         app.send_message(message.chat.id, f'--**Available formats**--:\n\n**VIDEOS/AUDIOS** 📹 / 🔊 \n__{VIDAUD}__',
                          reply_to_message_id=message.id)
@@ -1229,15 +1474,17 @@ def audio(client: pyrogram.client.Client, message: pyrogram.types.messages_and_m
 @app.on_message(filters.voice)
 def voice(client: pyrogram.client.Client, message: pyrogram.types.messages_and_media.message.Message):
     saveMsg(message, "VOICE")
+    prefetchmedia(message)
     app.send_message(message.chat.id,
                 f'__Detected Extension:__ **OGG** 📹 / 🔊\n__Now send extension to Convert to...__\n\n--**Available formats**-- \n\n__{VA_TEXT}__\n\n{message.from_user.mention} __choose or click /cancel to Cancel or use /rename  to  Rename__',
-                reply_markup=VAboard, reply_to_message_id=message.id)
+                reply_markup=AUDboard, reply_to_message_id=message.id)
 
 
 # photo
 @app.on_message(filters.photo)
 def photo(client: pyrogram.client.Client, message: pyrogram.types.messages_and_media.message.Message):
     saveMsg(message, "PHOTO")
+    prefetchmedia(message)
     app.send_message(message.chat.id,
                      f'__Detected Extension:__ **JPG** 📷\n__Now send extension to Convert to...__\n\n--**Available formats**-- \n\n__{IMG_TEXT}__\n\n**SPECIAL** 🎁\n__Colorize, Positive, Upscale & Scan__\n\n{message.from_user.mention} __choose or click /cancel to Cancel or use /rename  to  Rename__',
                      reply_markup=IMGboard, reply_to_message_id=message.id)
@@ -1247,6 +1494,7 @@ def photo(client: pyrogram.client.Client, message: pyrogram.types.messages_and_m
 @app.on_message(filters.sticker)
 def sticker(client: pyrogram.client.Client, message: pyrogram.types.messages_and_media.message.Message):
     saveMsg(message, "STICKER")
+    prefetchmedia(message)
     if not message.sticker.is_animated and not message.sticker.is_video:
         app.send_message(message.chat.id,
                      f'__Detected Extension:__ **WEBP** 📷\n__Now send extension to Convert to...__\n\n--**Available formats**-- \n\n__{IMG_TEXT}__\n\n**SPECIAL** 🎁\n__Colorize, Positive, Upscale & Scan__\n\n{message.from_user.mention} __choose or click /cancel to Cancel or use /rename  to  Rename__',
@@ -1263,15 +1511,13 @@ def text(client: pyrogram.client.Client, message: pyrogram.types.messages_and_me
 
     # save restricted
     if "https://t.me/" in message.text:
-        mf = threading.Thread(target=lambda:saverec(message),daemon=True)
-        mf.start()
+        enqueue(scheduler.LIGHT, lambda: saverec(message), message)
         return
 
     # magnet link
     if message.text[:8] == "magnet:?":
         oldm = app.send_message(message.chat.id,'__Processing...__', reply_to_message_id=message.id) 
-        tf = threading.Thread(target=lambda:gettorfile(message,oldm),daemon=True)
-        tf.start()
+        enqueue(scheduler.NET, lambda: gettorfile(message,oldm), message)
         return
 
     # normal
@@ -1281,74 +1527,67 @@ def text(client: pyrogram.client.Client, message: pyrogram.types.messages_and_me
         app.delete_messages(message.chat.id,message_ids=nmessage.id+1)
 
         if "COLOR" == message.text:
+            # audio has nothing to colorize, a typed COLOR can still reach here
+            if msg_type in ("AUDIO", "VOICE") or (msg_type == "DOCUMENT" and nmessage.document.file_name.upper().endswith(VIDAUD) and not nmessage.document.file_name.upper().endswith(VID)):
+                app.send_message(message.chat.id,"__Colorizing needs a Video__",reply_markup=ReplyKeyboardRemove(), reply_to_message_id=nmessage.id)
+                return
             oldm = app.send_message(message.chat.id,'__Processing__',reply_markup=ReplyKeyboardRemove(), reply_to_message_id=nmessage.id) 
-            col = threading.Thread(target=lambda:colorizeimage(nmessage,oldm),daemon=True)
-            col.start()
+            if msg_type in ("VIDEO", "VIDEO_NOTE") or (msg_type == "DOCUMENT" and nmessage.document.file_name.upper().endswith(VID)):
+                enqueue(scheduler.CPU, lambda: colorizevideo(nmessage,oldm), nmessage)
+            else:
+                enqueue(scheduler.NET, lambda: colorizeimage(nmessage,oldm), nmessage)
 
         elif "POSITIVE" == message.text:
             oldm = app.send_message(message.chat.id,'__Processing__',reply_markup=ReplyKeyboardRemove(), reply_to_message_id=nmessage.id) 
-            pos = threading.Thread(target=lambda:negetivetopostive(nmessage,oldm),daemon=True)
-            pos.start() 
+            enqueue(scheduler.CPU, lambda: negetivetopostive(nmessage,oldm), nmessage)
 
         elif "READ" == message.text:
             oldm = app.send_message(message.chat.id,'__Reading File__',reply_markup=ReplyKeyboardRemove(), reply_to_message_id=nmessage.id)
-            rf = threading.Thread(target=lambda:readf(nmessage,oldm),daemon=True)
-            rf.start()
+            enqueue(scheduler.LIGHT, lambda: readf(nmessage,oldm), nmessage)
 
         elif "SENDPHOTO" == message.text:
             oldm = app.send_message(message.chat.id,'__Sending in Photo Format__',reply_markup=ReplyKeyboardRemove(), reply_to_message_id=nmessage.id)
-            sp = threading.Thread(target=lambda:sendphoto(nmessage,oldm),daemon=True)
-            sp.start()
+            enqueue(scheduler.LIGHT, lambda: sendphoto(nmessage,oldm), nmessage)
 
         elif "SENDDOC" == message.text:
             oldm = app.send_message(message.chat.id,'__Sending in Document Format__',reply_markup=ReplyKeyboardRemove(), reply_to_message_id=nmessage.id)
-            sd = threading.Thread(target=lambda:senddoc(nmessage,oldm),daemon=True)
-            sd.start()  
+            enqueue(scheduler.NET, lambda: senddoc(nmessage,oldm), nmessage)
 
         elif "SENDVID" == message.text:
             oldm = app.send_message(message.chat.id,'__Sending in Stream Format__',reply_markup=ReplyKeyboardRemove(), reply_to_message_id=nmessage.id)
-            sv = threading.Thread(target=lambda:sendvideo(nmessage,oldm),daemon=True)
-            sv.start()
+            enqueue(scheduler.NET, lambda: sendvideo(nmessage,oldm), nmessage)
 
         elif "SpeechToText" == message.text:
             oldm = app.send_message(message.chat.id,'__Transcripting, takes long time for Long Files__',reply_markup=ReplyKeyboardRemove(), reply_to_message_id=nmessage.id)
-            stt = threading.Thread(target=lambda:transcript(nmessage,oldm),daemon=True)
-            stt.start()
+            enqueue(scheduler.NET, lambda: transcript(nmessage,oldm), nmessage)
 
         elif "TextToSpeech" == message.text:
             oldm = app.send_message(message.chat.id,'__Generating Speech__',reply_markup=ReplyKeyboardRemove(), reply_to_message_id=nmessage.id)
-            tts = threading.Thread(target=lambda:speak(nmessage,oldm),daemon=True)
-            tts.start()
+            enqueue(scheduler.NET, lambda: speak(nmessage,oldm), nmessage)
 
         elif "UPSCALE" == message.text:
             oldm = app.send_message(message.chat.id,'__Upscaling Your Image__',reply_markup=ReplyKeyboardRemove(), reply_to_message_id=nmessage.id)
-            upscl = threading.Thread(target=lambda:increaseres(nmessage,oldm),daemon=True)
-            upscl.start()
+            enqueue(scheduler.NET, lambda: increaseres(nmessage,oldm), nmessage)
 
         elif "EXTRACT" == message.text:
             oldm = app.send_message(message.chat.id,'__Extracting File__',reply_markup=ReplyKeyboardRemove(), reply_to_message_id=nmessage.id)
-            ex = threading.Thread(target=lambda:extract(nmessage,oldm),daemon=True)
-            ex.start()
+            enqueue(scheduler.CPU, lambda: extract(nmessage,oldm), nmessage)
 
         elif "COMPILE" == message.text:
             oldm = app.send_message(message.chat.id,'__Compiling__',reply_markup=ReplyKeyboardRemove(), reply_to_message_id=nmessage.id)
-            cmp = threading.Thread(target=lambda:compile(nmessage,oldm),daemon=True)
-            cmp.start()
+            enqueue(scheduler.CPU, lambda: compile(nmessage,oldm), nmessage)
 
         elif "SCAN" == message.text:
             oldm = app.send_message(message.chat.id,'__Scanning__',reply_markup=ReplyKeyboardRemove(), reply_to_message_id=nmessage.id)
-            scn = threading.Thread(target=lambda:scan(nmessage,oldm),daemon=True)
-            scn.start()
+            enqueue(scheduler.LIGHT, lambda: scan(nmessage,oldm), nmessage)
 
         elif "RUN" == message.text:
             oldm = app.send_message(message.chat.id,'__Running__',reply_markup=ReplyKeyboardRemove(), reply_to_message_id=nmessage.id)
-            rpro = threading.Thread(target=lambda:runpro(nmessage,oldm),daemon=True)
-            rpro.start()
+            enqueue(scheduler.LIGHT, lambda: runpro(nmessage,oldm), nmessage)
 
         elif "BG REMOVE" == message.text:
             oldm = app.send_message(message.chat.id,'__Background Removing__',reply_markup=ReplyKeyboardRemove(), reply_to_message_id=nmessage.id)
-            bgrm = threading.Thread(target=lambda:bgremove(nmessage,oldm),daemon=True)
-            bgrm.start()
+            enqueue(scheduler.NET, lambda: bgremove(nmessage,oldm), nmessage)
 
         elif msg_type == "DOCUMENT":
             inputt = nmessage.document.file_name
@@ -1386,9 +1625,13 @@ def text(client: pyrogram.client.Client, message: pyrogram.types.messages_and_me
             print("File is a Video Note")  
  
         elif msg_type == "PHOTO":
-            temp = app.download_media(nmessage)
-            inputt = temp.split("/")[-1]
-            os.remove(temp)
+            temp = prefetch.peek(prefetchkey(nmessage))
+            if temp is not None:
+                inputt = temp.split("/")[-1]
+            else:
+                temp = app.download_media(nmessage)
+                inputt = temp.split("/")[-1]
+                os.remove(temp)
             print("File is a Photo")
 
         else:
@@ -1404,19 +1647,20 @@ def text(client: pyrogram.client.Client, message: pyrogram.types.messages_and_me
             
         else:
             msg = app.send_message(message.chat.id, f'Converting from **{oldext.upper()}** to **{newext.upper()}**', reply_to_message_id=nmessage.id, reply_markup=ReplyKeyboardRemove())
-            conv = threading.Thread(target=lambda: follow(nmessage, inputt, newext, oldext, msg), daemon=True)
-            conv.start()
+            startfollow(nmessage, inputt, newext, oldext, msg)
 
     else:
         if str(message.from_user.id) == str(message.chat.id):
             if len(message.text.split("\n")) == 1:
-                ots = threading.Thread(target=lambda: other(message), daemon=True)
-                ots.start()
+                enqueue(scheduler.LIGHT, lambda: other(message), message)
             else: 
                 saveMsg(message, "TEXT")  
                 app.send_message(message.chat.id, '__for Text messages, You can use **/make** to Create a File from it.\n(first line of text will be trancated and used as filename)__', reply_to_message_id=message.id)
 
 #apprun
-print("Bot Started")
-app.run()
+# spawned processes (colorvideo's pool) import this file again, they must not start a second bot
+if __name__ == "__main__":
+    convcache.load()
+    print("Bot Started")
+    app.run()
 
@@ -1,16 +1,99 @@
 from PIL import Image
 import os
+import threading
 from time import time
-from subprocess import run as srun, check_output
+from execute import run as srun
 from json import loads as jsonloads
+from collections import OrderedDict
+import workspace
 
-def take_ss(video_file, duration):
-    des_dir = 'Thumbnails'
+
+# probe cache, one ffprobe per file
+CACHESIZE = 256
+lock = threading.Lock()
+bypath = OrderedDict()    # (path, mtime, size) -> probe
+byuid = OrderedDict()     # file_unique_id -> probe
+
+
+def remember(cache, key, data):
+    cache[key] = data
+    cache.move_to_end(key)
+    while len(cache) > CACHESIZE:
+        cache.popitem(last=False)
+
+
+# parsed "ffprobe -show_format -show_streams" json of a file, {} if it can't be probed
+def probe(path, uid=None):
+    with lock:
+        if uid is not None and uid in byuid:
+            byuid.move_to_end(uid)
+            return byuid[uid]
+
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return {}
+    key = (os.path.abspath(path), stat.st_mtime, stat.st_size)
+
+    with lock:
+        if key in bypath:
+            bypath.move_to_end(key)
+            data = bypath[key]
+            if uid is not None:
+                remember(byuid, uid, data)
+            return data
+
+    try:
+        result = srun(["ffprobe", "-hide_banner", "-loglevel", "error", "-print_format",
+                       "json", "-show_format", "-show_streams", path], capture=True).stdout.decode('utf-8')
+        data = jsonloads(result)
+    except Exception as e:
+        print(f'{e}. Mostly file not found!')
+        return {}
+
+    with lock:
+        remember(bypath, key, data)
+        if uid is not None:
+            remember(byuid, uid, data)
+    return data
+
+
+def streams(path, uid=None):
+    return probe(path, uid).get('streams', [])
+
+
+def dimensions(path, uid=None):
+    for stream in streams(path, uid):
+        if stream.get('codec_type') == 'video' and stream.get('disposition', {}).get('attached_pic', 0) == 0:
+            return stream.get('width'), stream.get('height')
+    return None, None
+
+
+# text of the info page (format first, then every stream)
+def infotext(path, uid=None):
+    data = probe(path, uid)
+    sections = []
+    if 'format' in data:
+        sections.append(data['format'])
+    sections += data.get('streams', [])
+
+    lines = []
+    for section in sections:
+        for k, v in section.items():
+            if isinstance(v, dict):
+                v = ", ".join(f"{dk}={dv}" for dk, dv in v.items())
+            lines.append(f"{k}     =        {v}")
+        lines.append("")
+    return "<br>".join(lines)
+
+
+def take_ss(video_file, duration, uid=None):
+    des_dir = workspace.path('Thumbnails')
     if not os.path.exists(des_dir):
         os.mkdir(des_dir)
     des_dir = os.path.join(des_dir, f"{time()}.jpg")
     if duration is None:
-        duration = get_media_info(video_file)[0]
+        duration = get_media_info(video_file, uid)
     if duration == 0:
         duration = 3
     duration = duration // 2
@@ -26,32 +109,27 @@ def take_ss(video_file, duration):
     return des_dir
 
 
-def get_media_info(path):
-    try:
-        result = check_output(["ffprobe", "-hide_banner", "-loglevel", "error", "-print_format",
-                               "json", "-show_format", "-show_streams", path]).decode('utf-8')
-    except Exception as e:
-        print(f'{e}. Mostly file not found!')
-        return 0, None, None
-
-    fields = jsonloads(result).get('format')
+def get_media_info(path, uid=None):
+    fields = probe(path, uid).get('format')
     if fields is None:
-        print(f"get_media_info: {result}")
-        return 0, None, None
+        print(f"get_media_info: no format for {path}")
+        return 0
 
     duration = round(float(fields.get('duration', 0)))
 
     return duration
 
 
-def allinfo(file,thumb=None):
-    duration = get_media_info(file)
+def allinfo(file,thumb=None,uid=None):
+    duration = get_media_info(file, uid)
     if thumb is None:
-        thumb = take_ss(file, duration)
+        thumb = take_ss(file, duration, uid)
     if thumb is not None:
         with Image.open(thumb) as img:
             width, height = img.size
     else:
+        width, height = dimensions(file, uid)
+    if width is None:
         width = 480
         height = 320
 
@@ -0,0 +1,311 @@
+import os
+import queue
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import helperfunctions
+import execute
+import jobctl
+
+
+# settings
+INSTANCES = int(os.environ.get("OFFICE_INSTANCES", os.environ.get("OFFICE_WORKERS", 2)))
+RECYCLE = int(os.environ.get("OFFICE_RECYCLE", 200))      # restart an instance after this many jobs, soffice leaks
+STARTUP = int(os.environ.get("OFFICE_STARTUP", 60))       # seconds to wait for an instance to accept connections
+DEADLINE = int(os.environ.get("OFFICE_DEADLINE", 300))    # seconds a pooled conversion may take before its instance is killed
+BINARY = os.environ.get("OFFICE_BIN", "libreoffice")
+PROFILES = os.path.join(tempfile.gettempdir(), "office-profiles")
+
+# export filter of every output per document kind, anything missing goes to the cold start path
+FILTERS = {
+    "writer": {
+        "pdf": "writer_pdf_Export", "docx": "MS Word 2007 XML", "doc": "MS Word 97", "odt": "writer8",
+        "ott": "writer8_template", "dotx": "MS Word 2007 XML Template", "dot": "MS Word 97 Vorlage",
+        "rtf": "Rich Text Format", "txt": "Text", "html": "HTML (StarWriter)", "xml": "MS Word 2003 XML",
+        "epub": "EPUB", "fodt": "OpenDocument Text Flat XML",
+    },
+    "calc": {
+        "pdf": "calc_pdf_Export", "xlsx": "Calc MS Excel 2007 XML", "xls": "MS Excel 97", "ods": "calc8",
+        "ots": "calc8_template", "xltx": "Calc MS Excel 2007 XML Template", "xlt": "MS Excel 97 Vorlage/Template",
+        "xlsm": "Calc MS Excel 2007 VBA XML", "csv": "Text - txt - csv (StarCalc)", "html": "HTML (StarCalc)",
+        "xml": "MS Excel 2003 XML", "fods": "OpenDocument Spreadsheet Flat XML",
+    },
+    "impress": {
+        "pdf": "impress_pdf_Export", "pptx": "Impress MS PowerPoint 2007 XML", "ppt": "MS PowerPoint 97",
+        "odp": "impress8", "otp": "impress8_template", "ppsx": "Impress MS PowerPoint 2007 XML AutoPlay",
+        "pps": "MS PowerPoint 97 AutoPlay", "potx": "Impress MS PowerPoint 2007 XML Template",
+        "pot": "MS PowerPoint 97 Vorlage", "pptm": "Impress MS PowerPoint 2007 XML VBA", "odg": "impress8_draw",
+        "fodp": "OpenDocument Presentation Flat XML",
+    },
+    "draw": {
+        "pdf": "draw_pdf_Export", "odg": "draw8", "otg": "draw8_template",
+    },
+}
+SERVICES = (
+    ("com.sun.star.text.TextDocument", "writer"),
+    ("com.sun.star.sheet.SpreadsheetDocument", "calc"),
+    ("com.sun.star.presentation.PresentationDocument", "impress"),
+    ("com.sun.star.drawing.DrawingDocument", "draw"),
+)
+
+try:
+    import uno
+    from com.sun.star.beans import PropertyValue
+except ImportError:
+    uno = None
+
+lock = threading.Lock()
+idle = queue.Queue()
+started = False
+up = 0          # instances that started and were not retired since
+stats = {"pooled": 0, "pooledtime": 0.0, "cold": 0, "coldtime": 0.0, "restarts": 0}
+
+
+def props(**kwargs):
+    values = []
+    for k, v in kwargs.items():
+        value = PropertyValue()
+        value.Name = k
+        value.Value = v
+        values.append(value)
+    return tuple(values)
+
+
+def freeport():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# one headless soffice with its own profile, so instances never fight over a lock file
+class Instance:
+    def __init__(self, number):
+        self.number = number
+        self.profile = os.path.join(PROFILES, str(number))
+        self.proc = None
+        self.desktop = None
+        self.jobs = 0
+        self.counted = False    # part of up
+
+    def start(self):
+        self.port = freeport()
+        self.proc = subprocess.Popen([BINARY, "--headless", "--invisible", "--nocrashreport", "--nodefault",
+                                      "--nologo", "--nofirststartwizard", "--norestore",
+                                      f"-env:UserInstallation=file://{self.profile}",
+                                      f"--accept=socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext"],
+                                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local)
+        url = f"uno:socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext"
+
+        deadline = time.time() + STARTUP
+        while True:
+            try:
+                ctx = resolver.resolve(url)
+                break
+            except Exception:
+                if self.proc.poll() is not None or time.time() > deadline:
+                    self.stop()
+                    raise RuntimeError(f"office instance {self.number} did not start")
+                time.sleep(0.5)
+        self.desktop = ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+        self.jobs = 0
+
+    # also called by the watchdog while a conversion is blocked on the instance
+    def stop(self):
+        proc, self.proc = self.proc, None
+        self.desktop = None
+        if proc is not None and proc.poll() is None:
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except OSError:
+                pass
+            proc.wait()
+
+    def healthy(self):
+        return self.proc is not None and self.proc.poll() is None and self.desktop is not None
+
+    def convert(self, inputt, output, new):
+        load = {"Hidden": True, "ReadOnly": True}
+        if inputt.lower().endswith(".pdf"):
+            load["FilterName"] = "writer_pdf_import"
+
+        doc = self.desktop.loadComponentFromURL(uno.systemPathToFileUrl(os.path.abspath(inputt)),
+                                                "_blank", 0, props(**load))
+        if doc is None:
+            raise RuntimeError("office could not open the file")
+        try:
+            kind = next((k for service, k in SERVICES if doc.supportsService(service)), None)
+            export = FILTERS.get(kind, {}).get(new)
+            if export is None:
+                return False
+            doc.storeToURL(uno.systemPathToFileUrl(os.path.abspath(output)), props(FilterName=export))
+        finally:
+            doc.close(True)
+        self.jobs += 1
+        return True
+
+
+def record(name, took=None):
+    with lock:
+        stats[name] += 1
+        if took is not None:
+            stats[name + "time"] += took
+
+
+def start():
+    global started
+    with lock:
+        if started:
+            return
+        started = True
+    if uno is None:
+        print("officepool : python uno not found, using cold starts")
+        return
+    for number in range(INSTANCES):
+        threading.Thread(target=boot, args=(Instance(number),), name=f"office-{number}", daemon=True).start()
+
+
+# (re)start an instance off the job threads, one that fails to boot still joins the pool
+# and is retired again by the next job that takes it
+def boot(instance, restart=False):
+    global up
+    if restart:
+        instance.stop()
+        record("restarts")
+    # a crashed instance can leave a broken profile behind
+    shutil.rmtree(instance.profile, ignore_errors=True)
+    try:
+        instance.start()
+        with lock:
+            up += 1
+            instance.counted = True
+    except Exception as e:
+        print(f"officepool : {e}")
+    idle.put(instance)
+
+
+def retire(instance):
+    global up
+    with lock:
+        if instance.counted:
+            up -= 1
+            instance.counted = False
+    threading.Thread(target=boot, args=(instance, True), name=f"office-{instance.number}", daemon=True).start()
+
+
+# kills the instance once the conversion runs past DEADLINE or the job is stopped,
+# the blocked uno call then fails. returns the stop function, and whether it fired
+def watchdog(instance):
+    job = jobctl.current()
+    finished = threading.Event()
+    fired = []
+
+    def watch():
+        deadline = time.time() + DEADLINE
+        while not finished.wait(1):
+            if time.time() > deadline or jobctl.cancelled(job):
+                fired.append(True)
+                print(f"officepool instance {instance.number} : killed, {'job stopped' if jobctl.cancelled(job) else 'conversion hung'}")
+                instance.stop()
+                return
+
+    threading.Thread(target=watch, daemon=True).start()
+    return finished.set, fired
+
+
+# convert with an idle instance, returns False if the caller should use the cold start path
+# and None if the document hung an instance (a cold start would hang on it too)
+# never waits for an instance to (re)start, that happens in the background
+def pooled(inputt, output, new):
+    if uno is None:
+        return False
+    with lock:
+        ready = up > 0
+    try:
+        # with nothing running only a broken instance can be waiting, taken to be retried
+        instance = idle.get(block=ready, timeout=STARTUP)
+    except queue.Empty:
+        return False
+    if not instance.healthy():
+        retire(instance)
+        return False
+
+    begin = time.time()
+    stop, fired = watchdog(instance)
+    try:
+        done = instance.convert(inputt, output, new)
+    except Exception as e:
+        print(f"officepool instance {instance.number} : {e}")
+        done = False
+    finally:
+        stop()
+
+    if fired or not instance.healthy() or instance.jobs >= RECYCLE:
+        retire(instance)
+    else:
+        idle.put(instance)
+    jobctl.check()
+    if fired:
+        return None
+
+    if done:
+        record("pooled", time.time() - begin)
+    return done and os.path.exists(output)
+
+
+# a fresh soffice for one job, with a throwaway profile so parallel cold starts don't collide
+def cold(inputt, output, new):
+    profile = tempfile.mkdtemp(prefix="office-cold-")
+    begin = time.time()
+    try:
+        # the jvm and soffice reserve far more address space than they use
+        execute.run(helperfunctions.libreofficecommand(inputt, new, profile, os.path.dirname(os.path.abspath(output))),
+                    memory=None, env={**os.environ, "HOME": "."})
+    finally:
+        shutil.rmtree(profile, ignore_errors=True)
+    record("cold", time.time() - begin)
+
+
+# output has to be named like the input, --outdir only takes its folder
+def convert(inputt, output, new):
+    start()
+    done = pooled(inputt, output, new)
+    if done is None:
+        print("officepool : conversion hung, not retrying it")
+    elif not done:
+        cold(inputt, output, new)
+
+
+def report():
+    lines = []
+    for name in ("pooled", "cold"):
+        if stats[name]:
+            lines.append(f"{name}: {stats[name]} jobs, {stats[name + 'time'] / stats[name]:.2f}s avg")
+    lines.append(f"restarts: {stats['restarts']}")
+    return "\n".join(lines)
+
+
+# python3 officepool.py file.docx pdf [runs]
+# compares cold starts with the pool on the same file
+if __name__ == "__main__":
+    inputt, new = sys.argv[1], sys.argv[2]
+    runs = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    output = os.path.splitext(os.path.basename(inputt))[0] + "." + new
+
+    for _ in range(runs):
+        cold(inputt, output, new)
+    start()
+    deadline = time.time() + STARTUP
+    while up < INSTANCES and time.time() < deadline:
+        time.sleep(0.5)
+    for _ in range(runs):
+        if not pooled(inputt, output, new):
+            print("pool unavailable")
+            break
+    print(report())
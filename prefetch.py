@@ -0,0 +1,165 @@
+import os
+import shutil
+import threading
+import time
+import jobctl
+
+
+# settings
+ENABLED = os.environ.get("PREFETCH", "0") == "1"
+MAXSIZE = int(os.environ.get("PREFETCH_MAX", 200 * 1024 ** 2))    # bigger files are downloaded after choosing
+BUDGET = int(os.environ.get("PREFETCH_BUDGET", 2 * 1024 ** 3))    # bytes of prefetched files kept at once
+TTL = int(os.environ.get("PREFETCH_TTL", 900))                     # seconds before an unused prefetch is dropped
+FOLDER = os.path.abspath(os.environ.get("PREFETCH_DIR", "prefetch"))
+
+ENTRIES = {}
+cond = threading.Condition()
+reserved = 0
+started = False
+
+
+# one file being (or already) downloaded ahead of time
+class Entry:
+
+    def __init__(self, size):
+        self.size = size
+        self.path = None
+        self.done = False
+        self.cancelled = False
+        self.created = time.time()
+
+
+def folder(key):
+    return os.path.join(FOLDER, key) + "/"
+
+
+# reserve room for a prefetch, returns False if it should not be done
+def begin(key, size):
+    global reserved
+    if not ENABLED or size is None or size <= 0 or size > MAXSIZE:
+        return False
+
+    os.makedirs(FOLDER, exist_ok=True)
+    if shutil.disk_usage(FOLDER).free < 2 * size:
+        return False
+
+    with cond:
+        if key in ENTRIES or reserved + size > BUDGET:
+            return False
+        ENTRIES[key] = Entry(size)
+        reserved += size
+    start()
+    return True
+
+
+# download ended, path is None if it failed or was stopped
+def finish(key, path):
+    with cond:
+        entry = ENTRIES.get(key)
+        if entry is None or entry.cancelled:
+            remove(path)
+            release(key)
+            return
+        entry.path = path
+        entry.done = True
+        if path is None:
+            release(key)
+        cond.notify_all()
+
+
+def cancelled(key):
+    with cond:
+        entry = ENTRIES.get(key)
+        return entry is not None and entry.cancelled
+
+
+# stop the download (the progress callback sees cancelled) or drop the finished file
+def cancel(key):
+    with cond:
+        entry = ENTRIES.get(key)
+        if entry is None:
+            return
+        entry.cancelled = True
+        if entry.done:
+            remove(entry.path)
+            release(key)
+        cond.notify_all()
+
+
+# a download was started for key and is still running or waiting to be taken
+def active(key):
+    with cond:
+        entry = ENTRIES.get(key)
+        return entry is not None and not entry.cancelled
+
+
+# path of the finished download without taking it
+def peek(key):
+    with cond:
+        entry = ENTRIES.get(key)
+        if entry is None or not entry.done:
+            return None
+        return entry.path
+
+
+# hand the downloaded file to the job, waiting for a running download to end
+# returns None when nothing usable was prefetched, raises jobctl.Cancelled if job is stopped meanwhile
+def take(key, job=None):
+    job = job or jobctl.current()
+    with cond:
+        entry = ENTRIES.get(key)
+        if entry is None:
+            return None
+        while not cond.wait_for(lambda: entry.done or entry.cancelled, 1):
+            jobctl.check(job)
+        if not entry.done or entry.cancelled or entry.path is None or not os.path.exists(entry.path):
+            return None
+        release(key)
+        return entry.path
+
+
+# lock must be held
+def release(key):
+    global reserved
+    entry = ENTRIES.pop(key, None)
+    if entry is not None:
+        reserved -= entry.size
+    cond.notify_all()
+
+
+def remove(path):
+    if path is not None and os.path.exists(path):
+        os.remove(path)
+
+
+def start():
+    global started
+    with cond:
+        if started:
+            return
+        started = True
+    threading.Thread(target=sweeper, name="prefetch", daemon=True).start()
+
+
+# drop expired prefetches and the empty folders left by taken ones
+def sweeper():
+    while True:
+        time.sleep(60)
+        now = time.time()
+        with cond:
+            expired = [key for key, entry in ENTRIES.items() if now - entry.created > TTL]
+        for key in expired:
+            cancel(key)
+
+        with cond:
+            active = set(ENTRIES)
+        if not os.path.isdir(FOLDER):
+            continue
+        for name in os.listdir(FOLDER):
+            path = os.path.join(FOLDER, name)
+            if name in active or not os.path.isdir(path):
+                continue
+            try:
+                os.rmdir(path)
+            except OSError:
+                pass
@@ -1,14 +1,14 @@
 import requests
-import os
+import workspace
+import execute
 
 # setting
 c4go = 'c4go'
 
 
 def c2Go(cfile):
-    cmd = f'{c4go} transpile {cfile}'
-    os.system(cmd)
-    gofile = cfile.split("/")[-1].replace(".c",".go")
+    gofile = workspace.output(cfile.split("/")[-1].replace(".c",".go"))
+    execute.run([c4go, "transpile", "-o", gofile, cfile])
     return gofile
 
 
@@ -19,8 +19,7 @@ def py2Many(pyfile,lang="cpp"):
         if lang == langs[i]:
             ext = extensions[i]
   
-    cmd = f'py2many --{lang}=1 {pyfile}'
-    os.system(cmd)
+    execute.run(["py2many", f"--{lang}=1", pyfile])
     file = pyfile.replace(".py", ext)
     return file
 
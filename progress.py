@@ -0,0 +1,151 @@
+import threading
+import time
+
+
+# settings
+EVERY = 10          # seconds between edits of the same status message
+RATE = 5            # max status edits per second for the whole bot
+
+ENTRIES = {}
+cond = threading.Condition()
+editor = None
+started = False
+
+
+# one in-flight transfer (or conversion) shown in a status message
+class Entry:
+
+    def __init__(self, chat_id, msg_id, label):
+        self.chat_id = chat_id
+        self.msg_id = msg_id
+        self.label = label
+        self.text = ""
+        self.dirty = False
+        self.done = False
+        self.last = time.time()
+
+
+# edit is called as edit(chat_id, msg_id, text) from the updater thread
+def setup(edit):
+    global editor
+    editor = edit
+
+
+def start():
+    global started
+    with cond:
+        if started:
+            return
+        started = True
+    threading.Thread(target=updater, name="progress", daemon=True).start()
+
+
+# register a job, msg is the status message to keep edited (or None to only track)
+def track(key, msg, label):
+    with cond:
+        if msg is None:
+            ENTRIES[key] = Entry(None, None, label)
+        else:
+            ENTRIES[key] = Entry(msg.chat.id, msg.id, label)
+        cond.notify_all()
+    if msg is not None:
+        start()
+
+
+def settext(key, text):
+    with cond:
+        entry = ENTRIES.get(key)
+        if entry is None or entry.text == text:
+            return
+        entry.text = text
+        entry.dirty = True
+        cond.notify_all()
+
+
+# pyrogram style progress callback
+def update(key, current, total):
+    if total:
+        settext(key, f"{current * 100 / total:.1f}%")
+
+
+# readable duration, 1h 2m / 3m 20s / 45s
+def span(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m {seconds % 60}s"
+    return f"{seconds}s"
+
+
+# ffmpeg "-progress pipe:1" output of one or more processes working on parts of the same media
+# the status shows percent of duration, speed against realtime and time left
+class Transcode:
+
+    def __init__(self, key, duration):
+        self.key = key
+        self.duration = duration
+        self.reset()
+
+    def reset(self):
+        self.parts = {}
+        self.begin = time.time()
+
+    # line callback for the process converting part
+    def reader(self, part=0):
+        self.parts[part] = 0.0
+        return lambda line: self.line(part, line)
+
+    def line(self, part, line):
+        name, _, value = line.strip().partition("=")
+        if name == "out_time_us" and value.isdigit():
+            self.parts[part] = int(value) / 1000000
+        elif name == "progress":
+            self.report()
+
+    def report(self):
+        done = sum(self.parts.values())
+        elapsed = time.time() - self.begin
+        if not self.duration or done <= 0 or elapsed <= 0:
+            return
+        percent = min(100.0, done * 100 / self.duration)
+        speed = done / elapsed
+        left = max(0.0, self.duration - done) / speed
+        settext(self.key, f"{percent:.1f}% at {speed:.1f}x, {span(left)} left")
+
+
+def finish(key):
+    with cond:
+        entry = ENTRIES.pop(key, None)
+        if entry is not None:
+            entry.done = True
+        cond.notify_all()
+
+
+# single thread editing every status message at a bounded rate
+def updater():
+    while True:
+        with cond:
+            while True:
+                now = time.time()
+                pending = [e for e in ENTRIES.values() if e.dirty and e.chat_id is not None]
+                due = [e for e in pending if now - e.last >= EVERY]
+                if due:
+                    break
+                if pending:
+                    cond.wait(min(EVERY - (now - e.last) for e in pending))
+                else:
+                    cond.wait()
+            for e in due:
+                e.dirty = False
+                e.last = now
+            edits = [(e, f"__{e.label}__ : **{e.text}**") for e in due]
+
+        for e, text in edits:
+            if e.done:
+                continue
+            try:
+                editor(e.chat_id, e.msg_id, text)
+            except Exception:
+                pass
+            time.sleep(1 / RATE)
@@ -0,0 +1,110 @@
+import os
+import threading
+from collections import deque
+
+
+# workload classes
+CPU = "cpu"          # ffmpeg, imagemagick, fontforge, compilers ...
+OFFICE = "office"    # libreoffice, calibre
+NET = "net"          # AI spaces, transfers, remote apis
+LIGHT = "light"      # text replies, small files
+
+
+def envint(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+# (workers, max queued) per class
+LIMITS = {
+    CPU: (envint("CPU_WORKERS", max(1, (os.cpu_count() or 2) // 2)), envint("CPU_QUEUE", 20)),
+    OFFICE: (envint("OFFICE_WORKERS", 2), envint("OFFICE_QUEUE", 10)),
+    NET: (envint("NET_WORKERS", 8), envint("NET_QUEUE", 40)),
+    LIGHT: (envint("LIGHT_WORKERS", 4), envint("LIGHT_QUEUE", 50)),
+}
+
+
+# a queued unit of work
+class Job:
+
+    def __init__(self, pool, target):
+        self.pool = pool
+        self.target = target
+        self.onstart = None
+        self.queued = 0
+        self.ready = threading.Event()
+
+
+# bounded worker pool for one workload class
+class Pool:
+
+    def __init__(self, name, workers, depth):
+        self.name = name
+        self.workers = workers
+        self.depth = depth
+        self.pending = deque()
+        self.busy = 0
+        self.threads = []
+        self.cond = threading.Condition()
+
+    def start(self):
+        while len(self.threads) < self.workers:
+            t = threading.Thread(target=self.work, name=f"{self.name}-{len(self.threads)}", daemon=True)
+            self.threads.append(t)
+            t.start()
+
+    def waiting(self):
+        return max(0, len(self.pending) - (self.workers - self.busy))
+
+    def submit(self, target):
+        with self.cond:
+            if self.waiting() >= self.depth:
+                return None
+            self.start()
+            job = Job(self, target)
+            self.pending.append(job)
+            job.queued = self.waiting()
+            self.cond.notify()
+            return job
+
+    def work(self):
+        while True:
+            with self.cond:
+                while not self.pending:
+                    self.cond.wait()
+                job = self.pending.popleft()
+                self.busy += 1
+
+            job.ready.wait()
+            try:
+                if job.onstart is not None:
+                    job.onstart()
+            except Exception as e:
+                print(f"{self.name} onstart: {e}")
+            try:
+                job.target()
+            except Exception as e:
+                print(f"{self.name} job failed: {e}")
+            finally:
+                with self.cond:
+                    self.busy -= 1
+
+
+POOLS = {name: Pool(name, *limit) for name, limit in LIMITS.items()}
+
+
+# queue target on the pool for category, returns Job or None if the queue is full
+# onqueued(position) is called when the job has to wait and may return a callable run when it starts
+def submit(category, target, onqueued=None):
+    job = POOLS[category].submit(target)
+    if job is None:
+        return None
+
+    try:
+        if onqueued is not None and job.queued > 0:
+            job.onstart = onqueued(job.queued)
+    finally:
+        job.ready.set()
+    return job
@@ -0,0 +1,27 @@
+import threading
+
+
+lock = threading.Lock()
+flights = {}    # key -> callbacks waiting for the running job
+
+
+# returns True if the caller should run the job for key (and must call done),
+# False if the same job is already running and callback will be called when it ends
+def join(key, callback):
+    with lock:
+        if key in flights:
+            flights[key].append(callback)
+            return False
+        flights[key] = []
+        return True
+
+
+# the job for key ended, fan out to everyone that joined it
+def done(key):
+    with lock:
+        waiters = flights.pop(key, [])
+    for callback in waiters:
+        try:
+            callback()
+        except Exception as e:
+            print(f"singleflight {key}: {e}")
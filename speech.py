@@ -0,0 +1,162 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import speech_recognition as sr
+import jobctl
+import execute
+
+
+# settings
+WORKERS = int(os.environ.get("STT_WORKERS", 4))     # segments recognized at once
+RATE = 16000
+FRAME = 480                 # samples, 30 ms
+WINDOW = 100                # frames read from ffmpeg at a time (3 s)
+SILENCE = 17                # silent frames (~500 ms) that end a segment
+KEEP = 10                   # silent frames (~300 ms) kept around speech
+MINIMUM = 33                # frames (~1 s) a segment needs before silence can end it
+MAXIMUM = 1000              # frames (30 s) after which a segment is cut anyway
+FLOOR = 300                 # rms below which a frame is always silence
+RATIO = 3.0                 # how far above the noise floor speech is
+
+
+# incremental energy based segmentation of 16 kHz mono s16le frames
+class Segmenter:
+
+    def __init__(self):
+        self.frames = []
+        self.preroll = deque(maxlen=KEEP)
+        self.voiced = False
+        self.quiet = 0
+        # starts at FLOOR rather than the first frame, which may already be speech
+        self.noise = FLOOR
+
+    # the noise floor drops quickly and rises slowly, slowest on speech,
+    # so quiet syllables don't drag it up into the speech level
+    def loud(self, rms):
+        loud = rms > max(FLOOR, self.noise * RATIO)
+        if rms < self.noise:
+            self.noise += (rms - self.noise) * 0.05
+        else:
+            self.noise += (rms - self.noise) * (0.001 if loud else 0.005)
+        return loud
+
+    # feed a block of whole frames, returns the segments (pcm bytes) it completed
+    def feed(self, samples):
+        done = []
+        frames = samples.reshape(-1, FRAME)
+        energy = np.sqrt(np.mean(frames.astype(np.float32) ** 2, axis=1))
+        for frame, rms in zip(frames, energy):
+            loud = self.loud(rms)
+            if not self.voiced:
+                if loud:
+                    self.voiced = True
+                    self.frames = list(self.preroll)
+                    self.preroll.clear()
+                else:
+                    self.preroll.append(frame)
+                    continue
+            self.frames.append(frame)
+            self.quiet = 0 if loud else self.quiet + 1
+            if (self.quiet >= SILENCE and len(self.frames) >= MINIMUM) or len(self.frames) >= MAXIMUM:
+                done.append(self.cut())
+        return done
+
+    def cut(self):
+        keep = len(self.frames) - max(0, self.quiet - KEEP)
+        segment = np.concatenate(self.frames[:keep]).tobytes()
+        self.frames = []
+        self.voiced = False
+        self.quiet = 0
+        return segment
+
+    def flush(self):
+        return [self.cut()] if self.voiced and self.frames else []
+
+
+# pcm of any media file, WINDOW frames at a time
+def decode(path):
+    running = execute.start(["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", path, "-vn", "-f", "s16le",
+                             "-ac", "1", "-ar", str(RATE), "pipe:1"], stdout=True)
+    size = WINDOW * FRAME * 2
+    try:
+        while True:
+            block = running.stdout.read(size)
+            if not block:
+                break
+            block = block[:len(block) - len(block) % (FRAME * 2)]
+            if block:
+                yield np.frombuffer(block, dtype=np.int16)
+    except GeneratorExit:
+        running.stop()
+        raise
+    finally:
+        running.finish()
+
+
+def google(pcm):
+    audio = sr.AudioData(pcm, RATE, 2)
+    for attempt in range(2):
+        try:
+            return f"{sr.Recognizer().recognize_google(audio).capitalize()}. "
+        except sr.UnknownValueError:
+            return "\n(error)\n"
+        except sr.RequestError as e:
+            print(f"speech google : {e}")
+    return "\n(error)\n"
+
+
+# transcribe a media file while it is decoded, recognize(pcm) -> text runs on WORKERS threads
+# segments are recognized out of order and joined in order
+def transcribe(path, recognize=google):
+    segmenter = Segmenter()
+    slots = threading.BoundedSemaphore(WORKERS * 2)     # decoding never runs far ahead of recognition
+    pending = deque()
+    texts = []
+    job = jobctl.current()
+
+    def work(pcm):
+        try:
+            jobctl.check(job)
+            return recognize(pcm)
+        finally:
+            slots.release()
+
+    def submit(pool, segments):
+        for pcm in segments:
+            slots.acquire()
+            pending.append(pool.submit(work, pcm))
+        while pending and pending[0].done():
+            texts.append(pending.popleft().result())
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        for samples in decode(path):
+            jobctl.check(job)
+            submit(pool, segmenter.feed(samples))
+        submit(pool, segmenter.flush())
+        while pending:
+            texts.append(pending.popleft().result())
+    return "".join(texts)
+
+
+# python3 speech.py
+# segments synthetic speech (a modulated tone) with and without leading silence, offline
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+
+    def tone(seconds):
+        t = np.arange(int(seconds * RATE)) / RATE
+        return 6000 * np.sin(2 * np.pi * 220 * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 3 * t)) + rng.normal(0, 30, len(t))
+
+    def silence(seconds):
+        return rng.normal(0, 30, int(seconds * RATE))
+
+    for name, parts in (("speech at 0s", [tone(3), silence(1), tone(3), silence(1)]),
+                        ("speech at 1s", [silence(1), tone(3), silence(1), tone(3), silence(1)])):
+        samples = np.concatenate(parts).astype(np.int16)
+        segmenter = Segmenter()
+        segments = segmenter.feed(samples[:len(samples) - len(samples) % FRAME]) + segmenter.flush()
+        lengths = [len(segment) / (RATE * 2) for segment in segments]
+        print(f"{name}: {', '.join(f'{length:.2f}s' for length in lengths)}")
+        assert len(lengths) == 2 and all(3 <= length <= 3.7 for length in lengths), name
@@ -0,0 +1,180 @@
+import os
+import json
+import shutil
+import threading
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError
+import jobctl
+import execute
+import workspace
+import speech
+import aifunctions
+
+
+# settings
+BACKENDS = os.environ.get("STT_BACKENDS", "google,whisper,vosk,whispercpp").split(",")     # in order of preference
+POLICY = os.environ.get("STT_POLICY", "both")       # first, race or both
+VOSK_MODEL = os.environ.get("STT_VOSK_MODEL", "")
+WHISPERCPP = os.environ.get("STT_WHISPERCPP", "whisper-cli")
+WHISPERCPP_MODEL = os.environ.get("STT_WHISPERCPP_MODEL", "")
+
+REGISTRY = {}
+lock = threading.Lock()
+vosk = None
+
+
+# a way to turn a media file into text, transcribe(path) -> text or None
+class Backend:
+
+    def __init__(self, name, caption, transcribe, available):
+        self.name = name
+        self.caption = caption
+        self.transcribe = transcribe
+        self.available = available
+
+
+def register(name, caption, available=lambda: True):
+    def add(transcribe):
+        REGISTRY[name] = Backend(name, caption, transcribe, available)
+        return transcribe
+    return add
+
+
+# configured backends that can run here, unknown and unavailable names are skipped
+def backends(names=None):
+    found = []
+    for name in names or BACKENDS:
+        backend = REGISTRY.get(name.strip())
+        if backend is not None and backend.available():
+            found.append(backend)
+    return found
+
+
+# text that is more than failed segments
+def usable(text):
+    if text and text.replace("(error)", "").strip():
+        return text
+    return None
+
+
+@register("google", "**Google Engine**")
+def google(path):
+    return speech.transcribe(path)
+
+
+@register("whisper", "**OpenAI Engine** __(whisper)__")
+def whisper(path):
+    return aifunctions.whisper(path)
+
+
+def voskmodel():
+    global vosk
+    with lock:
+        if vosk is None:
+            from vosk import Model, SetLogLevel
+            SetLogLevel(-1)
+            vosk = Model(VOSK_MODEL)
+        return vosk
+
+
+def vosksegment(pcm):
+    from vosk import KaldiRecognizer
+    recognizer = KaldiRecognizer(voskmodel(), speech.RATE)
+    recognizer.AcceptWaveform(pcm)
+    text = json.loads(recognizer.FinalResult()).get("text", "")
+    return f"{text.capitalize()}. " if text else ""
+
+
+@register("vosk", "**Vosk Engine** __(offline)__",
+          lambda: bool(VOSK_MODEL) and os.path.isdir(VOSK_MODEL) and importlib.util.find_spec("vosk") is not None)
+def offlinevosk(path):
+    return speech.transcribe(path, vosksegment)
+
+
+@register("whispercpp", "**Whisper.cpp Engine** __(offline)__",
+          lambda: bool(WHISPERCPP_MODEL) and os.path.isfile(WHISPERCPP_MODEL) and shutil.which(WHISPERCPP) is not None)
+def offlinewhisper(path):
+    wav = workspace.path(f"{os.path.basename(path)}-{threading.get_ident()}.wav")
+    try:
+        if not execute.run(["ffmpeg", "-y", "-i", path, "-vn", "-ac", "1", "-ar", str(speech.RATE), "-c:a", "pcm_s16le", wav]).ok:
+            return None
+        result = execute.run([WHISPERCPP, "-m", WHISPERCPP_MODEL, "-f", wav, "-nt", "-np"], capture=True, memory=None)
+        return result.stdout.decode(errors="ignore").strip() if result.ok else None
+    finally:
+        if os.path.exists(wav):
+            os.remove(wav)
+
+
+# deterministic and offline, for trying the pipeline out: STT_BACKENDS=stub
+@register("stub", "**Stub Engine**")
+def stub(path):
+    return speech.transcribe(path, lambda pcm: f"Segment of {len(pcm) / (speech.RATE * 2):.1f} seconds. ")
+
+
+# one backend on a pool thread, as its own sub job so a loser of a race can be stopped alone
+def attempt(backend, path, sub, folder):
+    previous = jobctl.current(), workspace.current()
+    jobctl.local.job = sub
+    workspace.local.path = folder
+    try:
+        return usable(backend.transcribe(path))
+    except jobctl.Cancelled:
+        return None
+    except Exception as e:
+        print(f"stt {backend.name} : {e}")
+        return None
+    finally:
+        jobctl.local.job, workspace.local.path = previous
+
+
+# transcripts of path as [(backend, text)]
+# first: backends in turn until one succeeds, race: all at once and the first success wins,
+# both: all at once and every success is kept
+def transcribe(path, policy=POLICY, names=None):
+    found = backends(names)
+    if policy == "first":
+        for backend in found:
+            text = attempt(backend, path, jobctl.current(), workspace.current())
+            jobctl.check()
+            if text:
+                return [(backend, text)]
+        return []
+
+    job = jobctl.current()
+    subs = {}
+    pool = ThreadPoolExecutor(max_workers=max(1, len(found)))
+    futures = {}
+    for backend in found:
+        sub = jobctl.Job(job.owner if job is not None else None)
+        sub.results = job.results if job is not None else sub.results
+        subs[backend.name] = sub
+        futures[pool.submit(attempt, backend, path, sub, workspace.current())] = backend
+    finished = []       # in the order they completed
+    try:
+        pending = set(futures)
+        won = False
+        while pending and not won:
+            try:
+                for future in as_completed(pending, timeout=1):
+                    pending.discard(future)
+                    finished.append(future)
+                    if policy == "race" and future.result():
+                        won = True
+                        break
+            except TimeoutError:
+                pass
+            jobctl.check(job)
+    finally:
+        # losers (or everything when the job itself was stopped) are killed, not waited for
+        for sub in subs.values():
+            sub.stop("cancel")
+        pool.shutdown(wait=False)
+
+    results = []
+    # a race is won by completion order, both keeps the order of preference
+    for future in finished if policy == "race" else [future for future in futures if future in finished]:
+        if future.result():
+            results.append((futures[future], future.result()))
+            if policy == "race":
+                break
+    return results
@@ -0,0 +1,195 @@
+import csv
+import datetime
+import os
+import re
+import zipfile
+from xml.etree.ElementTree import iterparse
+from xml.sax.saxutils import escape
+from openpyxl import Workbook, load_workbook
+
+
+# handled without libreoffice, one side has to be csv since
+# formulas, styles and charts of a workbook would be lost otherwise
+READS = ("csv", "xlsx", "xlsm", "ods")
+WRITES = ("csv", "xlsx", "ods")
+SNIFF = 64 * 1024
+NUMBER = re.compile(r"-?(0|[1-9]\d*)(\.\d+)?([eE][-+]?\d+)?")
+
+TABLE = "urn:oasis:names:tc:opendocument:xmlns:table:1.0"
+OFFICE = "urn:oasis:names:tc:opendocument:xmlns:office:1.0"
+TEXT = "urn:oasis:names:tc:opendocument:xmlns:text:1.0"
+
+
+def handles(inputt, new):
+    old = inputt.split(".")[-1].lower()
+    return old in READS and new in WRITES and old != new and "csv" in (old, new)
+
+
+# convert, returns False if the caller should use libreoffice
+def convert(inputt, output, new):
+    if not handles(inputt, new):
+        return False
+    try:
+        rows = READERS[inputt.split(".")[-1].lower()](inputt)
+        WRITERS[new](rows, output)
+        return True
+    except Exception as e:
+        print(f"tabular : {e}")
+        if os.path.exists(output):
+            os.remove(output)
+        return False
+
+
+# readers yield rows of the first sheet, like libreoffice does for csv
+
+def readcsv(inputt):
+    with open(inputt, newline="", encoding="utf-8-sig", errors="replace") as f:
+        sample = f.read(SNIFF)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+        except csv.Error:
+            dialect = csv.excel
+        for row in csv.reader(f, dialect):
+            yield [typed(cell) for cell in row]
+
+
+def readxlsx(inputt):
+    workbook = load_workbook(inputt, read_only=True, data_only=True)
+    try:
+        for row in workbook.worksheets[0].iter_rows(values_only=True):
+            yield list(row)
+    finally:
+        workbook.close()
+
+
+def readods(inputt):
+    with zipfile.ZipFile(inputt) as archive, archive.open("content.xml") as content:
+        blank = 0       # empty rows are held back so the trailing ones are never written
+        tables = 0
+        for event, elem in iterparse(content, events=("start", "end")):
+            if event == "start":
+                if elem.tag == f"{{{TABLE}}}table":
+                    tables += 1
+                continue
+            if elem.tag == f"{{{TABLE}}}table":
+                return
+            if elem.tag != f"{{{TABLE}}}table-row" or tables != 1:
+                continue
+
+            row = odsrow(elem)
+            repeat = int(elem.get(f"{{{TABLE}}}number-rows-repeated", 1))
+            elem.clear()
+            if not row:
+                blank += repeat
+                continue
+            for _ in range(blank):
+                yield []
+            blank = 0
+            for _ in range(repeat):
+                yield row
+
+
+def odsrow(elem):
+    row = []
+    blank = 0
+    for cell in elem:
+        if cell.tag not in (f"{{{TABLE}}}table-cell", f"{{{TABLE}}}covered-table-cell"):
+            continue
+        value = odsvalue(cell)
+        repeat = int(cell.get(f"{{{TABLE}}}number-columns-repeated", 1))
+        if value is None:
+            blank += repeat
+            continue
+        row += [None] * blank + [value] * repeat
+        blank = 0
+    return row
+
+
+def odsvalue(cell):
+    kind = cell.get(f"{{{OFFICE}}}value-type")
+    if kind in ("float", "percentage", "currency"):
+        return typed(cell.get(f"{{{OFFICE}}}value"))
+    if kind == "boolean":
+        return cell.get(f"{{{OFFICE}}}boolean-value") == "true"
+    if kind == "date":
+        return datetime.datetime.fromisoformat(cell.get(f"{{{OFFICE}}}date-value"))
+    paragraphs = ["".join(p.itertext()) for p in cell.iter(f"{{{TEXT}}}p")]
+    return "\n".join(paragraphs) if paragraphs else None
+
+
+# numbers from text, keeping things like zip codes with leading zeros as text
+def typed(value):
+    if value is None or not NUMBER.fullmatch(value):
+        return value
+    if value.lstrip("-").isdigit():
+        return int(value)
+    return float(value)
+
+
+def text(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime.datetime) and value.time() == datetime.time():
+        return value.date().isoformat()
+    return str(value)
+
+
+def writecsv(rows, output):
+    with open(output, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        for row in rows:
+            writer.writerow([text(value) for value in row])
+
+
+def writexlsx(rows, output):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Sheet1")
+    for row in rows:
+        sheet.append(row)
+    workbook.save(output)
+
+
+MANIFEST = """<?xml version="1.0" encoding="UTF-8"?>
+<manifest:manifest xmlns:manifest="urn:oasis:names:tc:opendocument:xmlns:manifest:1.0" manifest:version="1.2">
+ <manifest:file-entry manifest:full-path="/" manifest:media-type="application/vnd.oasis.opendocument.spreadsheet"/>
+ <manifest:file-entry manifest:full-path="content.xml" manifest:media-type="text/xml"/>
+</manifest:manifest>
+"""
+
+
+# content.xml is written row by row into the zip
+def writeods(rows, output):
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("mimetype", "application/vnd.oasis.opendocument.spreadsheet", compress_type=zipfile.ZIP_STORED)
+        archive.writestr("META-INF/manifest.xml", MANIFEST)
+        with archive.open("content.xml", "w") as content:
+            content.write(f'<?xml version="1.0" encoding="UTF-8"?>\n<office:document-content xmlns:office="{OFFICE}" '
+                          f'xmlns:table="{TABLE}" xmlns:text="{TEXT}" office:version="1.2"><office:body>'
+                          '<office:spreadsheet><table:table table:name="Sheet1">'.encode())
+            for row in rows:
+                content.write(("<table:table-row>" + "".join(odscell(value) for value in row)
+                               + "</table:table-row>").encode())
+            content.write(b"</table:table></office:spreadsheet></office:body></office:document-content>")
+
+
+def odscell(value):
+    if value is None:
+        return "<table:table-cell/>"
+    if isinstance(value, bool):
+        attrs = f'office:value-type="boolean" office:boolean-value="{str(value).lower()}"'
+    elif isinstance(value, (int, float)):
+        attrs = f'office:value-type="float" office:value="{value}"'
+    elif isinstance(value, (datetime.date, datetime.datetime)):
+        attrs = f'office:value-type="date" office:date-value="{value.isoformat()}"'
+    else:
+        attrs = 'office:value-type="string"'
+    return f"<table:table-cell {attrs}><text:p>{escape(text(value))}</text:p></table:table-cell>"
+
+
+READERS = {"csv": readcsv, "xlsx": readxlsx, "xlsm": readxlsx, "ods": readods}
+WRITERS = {"csv": writecsv, "xlsx": writexlsx, "ods": writeods}
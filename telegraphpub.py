@@ -0,0 +1,105 @@
+import queue
+import threading
+import time
+from collections import OrderedDict
+from telegraph import Telegraph
+
+
+# settings
+RETRIES = 3
+CACHESIZE = 2048
+ERROR = "Error in getting Info"
+
+telegraph = None
+lock = threading.Lock()
+pages = OrderedDict()     # key -> url
+jobs = queue.Queue()
+started = False
+
+
+# one client (and so one keep-alive http session) for the whole bot
+def client():
+    global telegraph
+    with lock:
+        if telegraph is None:
+            telegraph = Telegraph()
+            telegraph.create_account(short_name='file-converter')
+        return telegraph
+
+
+def cached(key):
+    if key is None:
+        return None
+    with lock:
+        return pages.get(key)
+
+
+# create a page right away (blocking), returns its url or ERROR
+def page(title, html, key=None):
+    url = cached(key)
+    if url is not None:
+        return url
+
+    for attempt in range(RETRIES):
+        try:
+            url = client().create_page(title, html_content=html)['url']
+            break
+        except Exception as e:
+            print(f"telegraph attempt {attempt + 1} : {e}")
+            time.sleep(2 ** attempt)
+    else:
+        return ERROR
+
+    if key is not None:
+        with lock:
+            pages[key] = url
+            while len(pages) > CACHESIZE:
+                pages.popitem(last=False)
+    return url
+
+
+# publish (key, title, html) items in the background, done(urls) is called with the urls in the same order
+# an item can be a plain url string when it is already known
+def publish(items, done):
+    start()
+    jobs.put((items, done))
+
+
+def start():
+    global started
+    with lock:
+        if started:
+            return
+        started = True
+    threading.Thread(target=publisher, name="telegraph", daemon=True).start()
+
+
+# takes every queued job at once so pages wanted by several jobs are created once
+def publisher():
+    while True:
+        batch = [jobs.get()]
+        while True:
+            try:
+                batch.append(jobs.get_nowait())
+            except queue.Empty:
+                break
+
+        made = {}
+        for items, done in batch:
+            urls = []
+            for item in items:
+                if isinstance(item, str):
+                    urls.append(item)
+                    continue
+                key, title, html = item
+                if key is not None and key in made:
+                    urls.append(made[key])
+                    continue
+                url = page(title, html, key)
+                if key is not None:
+                    made[key] = url
+                urls.append(url)
+            try:
+                done(urls)
+            except Exception as e:
+                print(f"telegraph publish callback : {e}")
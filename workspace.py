@@ -0,0 +1,163 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+
+# settings
+FOLDER = os.path.abspath(os.environ.get("WORKSPACE_DIR", "jobs"))
+TMPFS = os.environ.get("WORKSPACE_TMPFS", "")                             # e.g. /dev/shm, used for small jobs
+TMPFS_MAX = int(os.environ.get("WORKSPACE_TMPFS_MAX", 64 * 1024 ** 2))    # biggest input kept in memory
+TTL = int(os.environ.get("WORKSPACE_TTL", 6 * 3600))                      # seconds before an orphaned workspace is removed
+BUDGET = int(os.environ.get("WORKSPACE_BUDGET", 20 * 1024 ** 3))         # bytes all workspaces may use, running jobs included
+SWEEP = 300
+
+local = threading.local()
+lock = threading.Lock()
+active = set()
+started = False
+wake = threading.Event()
+
+
+def roots():
+    folders = [FOLDER]
+    if TMPFS:
+        folders.append(os.path.join(TMPFS, "file-converter-jobs"))
+    return folders
+
+
+# a new empty directory for one job, on tmpfs if the input is small enough to fit
+def create(size=None):
+    start()
+    folder = FOLDER
+    if TMPFS and size is not None and 0 < size <= TMPFS_MAX:
+        memory = roots()[1]
+        os.makedirs(memory, exist_ok=True)
+        if shutil.disk_usage(memory).free > 4 * size:
+            folder = memory
+    os.makedirs(folder, exist_ok=True)
+    path = tempfile.mkdtemp(prefix=f"{int(time.time())}-", dir=folder)
+    with lock:
+        active.add(path)
+    # make room now rather than at the next sweep
+    wake.set()
+    return path
+
+
+def release(path):
+    with lock:
+        active.discard(path)
+    shutil.rmtree(path, ignore_errors=True)
+
+
+# workspace of the job running on this thread, None outside of a job
+def current():
+    return getattr(local, "path", None)
+
+
+# where the running job keeps a file of that name, the bot's directory outside of a job
+def path(name):
+    folder = current()
+    return name if folder is None else os.path.join(folder, name)
+
+
+# separate folder for results, so an output keeps the input's name without overwriting it
+def output(name):
+    folder = current()
+    if folder is None:
+        return name
+    folder = os.path.join(folder, "out")
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, name)
+
+
+# move a file made outside of the job (a prefetched download) into its workspace,
+# so it is removed with the workspace however the job ends
+def adopt(name):
+    folder = current()
+    if folder is None:
+        return name
+    moved = os.path.join(folder, os.path.basename(name))
+    shutil.move(name, moved)
+    return moved
+
+
+# folder for pyrogram downloads (needs the trailing slash)
+def downloads():
+    folder = current()
+    return "downloads/" if folder is None else folder + "/"
+
+
+# run target inside a fresh workspace that is removed afterwards, whatever is left in it
+def run(target, size=None):
+    local.path = create(size)
+    try:
+        return target()
+    finally:
+        release(local.path)
+        local.path = None
+
+
+def start():
+    global started
+    with lock:
+        if started:
+            return
+        started = True
+    threading.Thread(target=sweeper, name="workspace", daemon=True).start()
+
+
+def usage(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for f in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, f)).st_size
+            except OSError:
+                pass
+    return total
+
+
+# removes workspaces left by crashes once they are older than TTL, or oldest first
+# while all workspaces together (running ones count but are never removed) take more than BUDGET
+def sweeper():
+    while True:
+        leftovers = []
+        total = 0
+        for root in roots():
+            if not os.path.isdir(root):
+                continue
+            for name in os.listdir(root):
+                path = os.path.join(root, name)
+                with lock:
+                    running = path in active
+                if running:
+                    total += usage(path)
+                    continue
+                try:
+                    leftovers.append((os.path.getmtime(path), path))
+                except OSError:
+                    pass
+
+        leftovers.sort()
+        now = time.time()
+        kept = []
+        for mtime, path in leftovers:
+            if now - mtime > TTL:
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                size = usage(path)
+                kept.append((path, size))
+                total += size
+
+        for path, size in kept:
+            if total <= BUDGET:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+        if total > BUDGET:
+            print(f"workspace : running jobs use {total // 1024 ** 2} MB, over the budget")
+
+        wake.wait(SWEEP)
+        wake.clear()